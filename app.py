@@ -1,18 +1,48 @@
 import json
-from web3 import Web3, HTTPProvider
 from argparse import ArgumentParser
-import logging
 from requests.exceptions import ConnectionError
 
+from pathlib import Path
+
+from src.account_pool import AccountPool
 from src.auction import Auction
 
 
 def main():
-    auction = Auction()
+    parser = ArgumentParser(description='Sealed double auction proof of concept.')
+    parser.add_argument('--auctions', type=int, default=1, help='Number of concurrent auction instances.')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Number of processes opening and clearing the auctions (default: number of CPUs).')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Collect bids off chain and post one Merkle root per batch of this many bids.')
+    parser.add_argument('--account-keys', type=str, default=None,
+                        help='Ganache account keys file (ganache-cli --acctKeys), to sign transactions locally.')
+    parser.add_argument('--format-version', type=int, default=1, choices=[1, 2],
+                        help='Bid format, 2 uses a single ring signature for quantity and bid value.')
+    parser.add_argument('--order-book-dir', type=str, default=None,
+                        help='Write opened bids to memory-mapped order books in this directory.')
+    parser.add_argument('--bidders-file', type=str, default='bidders.json', help='Bidder data file.')
+    parser.add_argument('--bidders', type=int, default=6,
+                        help='Number of bidders generated when the bidder data file does not exist.')
+    parser.add_argument('--ring-size', type=int, default=None,
+                        help='Number of keys in every ring (default: random).')
+    parser.add_argument('--account-pool-seed', type=str, default=None,
+                        help='Give bidders local accounts derived from this seed instead of the Ganache accounts.')
+    args = parser.parse_args()
+
+    private_keys = None
+    if args.account_keys is not None:
+        with open(args.account_keys, 'r') as keys_file:
+            private_keys = list(json.load(keys_file)['private_keys'].values())
+
+    account_pool = None if args.account_pool_seed is None else AccountPool(args.account_pool_seed)
+    auction = Auction(private_keys, account_pool=account_pool)
     try:
         auction.deploy()
-        auction.proof_of_concept()
-    except ConnectionError as e:
+        auction.proof_of_concept(list(range(args.auctions)), args.processes, args.batch_size,
+                                 args.format_version, args.order_book_dir, Path(args.bidders_file), args.bidders,
+                                 args.ring_size)
+    except ConnectionError:
         print('Cannot connect to Ganache.')
         print('Make sure that Ganache is running and try again...')
 
@@ -0,0 +1,186 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import json
+import logging
+import random
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional, List, Dict, Tuple, Any
+from Crypto.PublicKey import RSA
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_tester.backends.pyevm.main import get_default_genesis_params
+from web3 import Web3, EthereumTesterProvider
+
+from src.auction import Auction
+from src.auctioneer import Auctioneer
+from src.bidder import Bidder
+from src.helpers.utils.crypto import FORMAT_V1, FORMAT_V2
+from src.helpers.utils.randomness import RandomnessProvider
+from src.key_registry import KeyRegistry
+
+
+# --- Constants --- #
+SNAPSHOT_PATH = Path(__file__).with_name('gas_snapshot.json')
+RING_SIZES = [2, 4, 8, 16]
+FORMAT_VERSIONS = [FORMAT_V1, FORMAT_V2]
+TOLERANCE = 0.02  # Relative gas increase tolerated before a function counts as a regression.
+GAS_LIMIT = 30000000  # Block gas limit of the in-process chain, large rings do not fit the default one.
+SEED = 2020  # Keys, rings and nonces are derived from this seed, so that payload sizes are reproducible.
+
+
+def in_process_chain() -> Web3:
+    """
+    :return: Connection to a fresh in-process EVM.
+    """
+    genesis = get_default_genesis_params(overrides={'gas_limit': GAS_LIMIT})
+    return Web3(EthereumTesterProvider(EthereumTester(PyEVMBackend(genesis_parameters=genesis))))
+
+
+def transact(w3: Web3,
+             contract: Any,
+             sender: str,
+             func_name: str,
+             *args,
+             value: Optional[int] = 0
+             ) -> int:
+    """
+    Executes a smart contract function.
+    :return: Gas used by the transaction.
+    """
+    tx_hash = contract.functions[func_name](*args).transact({'from': sender, 'value': value})
+    return w3.eth.waitForTransactionReceipt(tx_hash).gasUsed
+
+
+def measure(ring_sizes: List[int],
+            format_versions: List[int]
+            ) -> Dict[str, int]:
+    """
+    Deploys the contract to an in-process EVM and runs one auction instance per bid format and ring size, with two
+    bidders whose payloads are generated by Bidder.bid.
+    :param ring_sizes: Ring sizes to be measured.
+    :param format_versions: Bid formats to be measured.
+    :return: Gas used per function, keyed by function, bid format and ring size.
+    """
+    random.seed(SEED)
+    rng = RandomnessProvider(seed=SEED)
+    w3 = in_process_chain()
+    accounts = w3.eth.accounts
+    abi, bytecode = Auction.compile()
+    tx_hash = w3.eth.contract(abi=abi, bytecode=bytecode).constructor().transact({'from': accounts[0]})
+    contract = w3.eth.contract(address=w3.eth.waitForTransactionReceipt(tx_hash).contractAddress, abi=abi)
+
+    logging.info(f'Generating {max(ring_sizes)} keys.')
+    auctioneer = Auctioneer(accounts[0], generate_new_keys=False)
+    auctioneer.import_key(RSA.generate(2048, randfunc=rng.nonce))
+    keys = [RSA.generate(2048, randfunc=rng.nonce) for _ in range(max(ring_sizes))]
+    for key in [auctioneer.public_key] + keys:
+        transact(w3, contract, accounts[0], 'registerKey', key.publickey().exportKey())
+
+    registry = KeyRegistry()
+    registry.sync(contract)
+    public_keys = [key.publickey() for key in keys] + [auctioneer.public_key]
+    bidders = []
+    for index, bidder_type in enumerate([1, 0]):
+        bidder = Bidder(bid_value=20 - 5 * index, quantity=10 + index, bidder_type=bidder_type,
+                        address=accounts[index + 1], generate_new_keys=False)
+        bidder.import_key(keys[index])
+        bidder.auctioneer_pub_key = auctioneer.public_key
+        bidders.append(bidder)
+
+    gas = {}
+    auction_id = 0
+    for format_version in format_versions:
+        for ring_size in ring_sizes:
+            logging.info(f'Measuring bid format {format_version} with rings of {ring_size} keys.')
+            label = f'v{format_version}/ring {ring_size}'
+            transact(w3, contract, accounts[0], 'startAuction', auction_id)
+            for index, bidder in enumerate(bidders):
+                bidder.make_ring(public_keys, ring_size)
+                c_quantity, c_bid_value, sig = bidder.bid(format_version, rng)
+                used = transact(w3, contract, bidder.address, 'placeBid', auction_id, c_quantity, c_bid_value, sig,
+                                bidder.export_ring(registry), bidder.bidder_type, value=Auction.DEPOSIT)
+                gas[f'placeBid (bidder {index + 1}) {label}'] = used
+
+            transact(w3, contract, accounts[0], 'endPlaceBid', auction_id)
+            for index, bidder in enumerate(bidders):
+                used = transact(w3, contract, bidder.address, 'openBid', auction_id, bidder.tau_1, bidder.tau_2)
+                gas[f'openBid (bidder {index + 1}) {label}'] = used
+
+            transact(w3, contract, accounts[0], 'endOpenBid', auction_id)
+            gas[f'punishBidder {label}'] = transact(w3, contract, accounts[0], 'punishBidder', auction_id,
+                                                    bidders[0].address)
+            gas[f'punishBidders {label}'] = transact(w3, contract, accounts[0], 'punishBidders', auction_id,
+                                                     [bidders[1].address])
+            gas[f'announceClearing {label}'] = transact(w3, contract, accounts[0], 'announceClearing', auction_id,
+                                                        10, 15, 1)
+            auction_id += 1
+
+    return gas
+
+
+def compare(gas: Dict[str, int],
+            baseline: Dict[str, int],
+            tolerance: float
+            ) -> Tuple[List[str], List[str]]:
+    """
+    :return: Rows of the gas table and functions which regressed past tolerance.
+    """
+    rows = [f'{"function":<48} {"gas":>10} {"baseline":>10} {"change":>8}']
+    regressions = []
+    for name, used in gas.items():
+        previous = baseline.get(name)
+        change = '' if previous is None else f'{(used - previous) / previous:+.2%}'
+        rows.append(f'{name:<48} {used:>10} {"" if previous is None else previous:>10} {change:>8}')
+        if previous is not None and used > previous * (1 + tolerance):
+            regressions.append(name)
+
+    return rows, regressions
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Gas snapshot of the DoubleAuction contract.')
+    parser.add_argument('--ring-sizes', type=int, nargs='+', default=RING_SIZES, help='Ring sizes to be measured.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Relative gas increase tolerated per function.')
+    parser.add_argument('--snapshot', type=Path, default=SNAPSHOT_PATH, help='Baseline snapshot file.')
+    parser.add_argument('--table', type=Path, default=None, help='Also write the gas table to this file.')
+    parser.add_argument('--update', action='store_true',
+                        help='Store the measured gas as the new baseline, required when there is no baseline yet.')
+    args = parser.parse_args()
+
+    if not args.update and not args.snapshot.exists():
+        print(f'No baseline at {args.snapshot}, run with --update on the reference contract to create it.')
+        sys.exit(2)
+
+    gas = measure(sorted(set(args.ring_sizes)), FORMAT_VERSIONS)
+    baseline = {}
+    if args.snapshot.exists():
+        with open(args.snapshot, 'r') as snapshot_file:
+            baseline = json.load(snapshot_file)
+
+    rows, regressions = compare(gas, baseline, args.tolerance)
+    print('\n'.join(rows))
+    if args.table is not None:
+        args.table.write_text('\n'.join(rows) + '\n')
+
+    if args.update:
+        with open(args.snapshot, 'w') as snapshot_file:
+            json.dump(gas, snapshot_file, indent=4, sort_keys=True)
+            snapshot_file.write('\n')
+
+        print(f'Baseline written to {args.snapshot}.')
+        return
+
+    if regressions:
+        print(f'{len(regressions)} functions use more than {args.tolerance:.0%} extra gas: {", ".join(regressions)}.')
+        sys.exit(1)
+
+    print('No gas regression.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+from argparse import ArgumentParser
+from pathlib import Path
+from random import randint
+from sys import byteorder
+from time import perf_counter
+
+from src.auctioneer import Auctioneer
+from src.helpers.utils.file_helper import get_bidders
+from src.helpers.utils.randomness import RandomnessProvider
+
+
+def nonce_throughput(n: int) -> None:
+    """
+    Compares the number of 32 bytes nonces per second drawn with random.randint and with the randomness provider.
+    """
+    sources = {
+        'random.randint': lambda: randint(0, 2**256 - 1).to_bytes(int(256 / 8), byteorder),
+        'provider (OS)': RandomnessProvider().nonce,
+        'provider (seeded)': RandomnessProvider(seed=0).nonce
+    }
+    for name, draw in sources.items():
+        start = perf_counter()
+        for _ in range(n):
+            draw()
+
+        elapsed = perf_counter() - start
+        print(f'{name:<20} {n / elapsed:>14,.0f} nonces/s')
+
+
+def bid_throughput(rounds: int) -> None:
+    """
+    Measures the time needed to generate the bids of bidders.json with the randomness provider.
+    """
+    auctioneer = Auctioneer('0x0')
+    bidders = get_bidders(Path('bidders.json'))
+    keys = [bidder.public_key for bidder in bidders] + [auctioneer.public_key]
+    for bidder in bidders:
+        bidder.auctioneer_pub_key = auctioneer.public_key
+        bidder.make_ring(keys)
+
+    rng = RandomnessProvider()
+    start = perf_counter()
+    for _ in range(rounds):
+        for bidder in bidders:
+            bidder.bid(rng=rng)
+
+    elapsed = perf_counter() - start
+    print(f'{"bids":<20} {rounds * len(bidders) / elapsed:>14,.1f} bids/s')
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Randomness provider throughput.')
+    parser.add_argument('--nonces', type=int, default=1000000, help='Number of nonces drawn per source.')
+    parser.add_argument('--bid-rounds', type=int, default=0, help='Rounds of bids generated for bidders.json.')
+    args = parser.parse_args()
+    nonce_throughput(args.nonces)
+    if args.bid_rounds:
+        bid_throughput(args.bid_rounds)
@@ -23,17 +23,29 @@ contract DoubleAuction{
         int clearingType;
     }
 
+    /* One auction instance, e.g. one grid zone during one trading interval */
+    struct Instance {
+        mapping(address => Bidder) bidders;
+        mapping(address => uint) deposit;
+        mapping(address => int) allocation;
+        mapping(address => uint) batchedBids;  /* Number of batched bids covered by the deposit of a collector */
+        bytes32[] batchRoots;
+        uint[] batchSizes;
+        Clearing clearing;
+        uint totalDeposit;
+        bool placeBidPhase;
+        bool openBidPhase;
+        bool announceResultPhase;
+    }
+
     address auctioneer;
-    mapping(address => Bidder) public bidders;
-    Clearing public clearing;
-    uint public totalDeposit = 0;
-    mapping(address => uint) public deposit;
-    bool placeBidPhase = false;
-    bool openBidPhase = false;
-    bool announceResultPhase = false;
+    mapping(uint => Instance) auctions;
+    bytes[] public keys;  /* Public key registry, rings refer to keys by their index */
 
     /* Events */
-    event newBidder(address newBidderAddress);
+    event newBidder(uint indexed auctionId, address newBidderAddress);
+    event newKey(uint index, address owner);
+    event newBatch(uint indexed auctionId, uint batchIndex, bytes32 root, uint size);
 
 
     /* Modifiers */
@@ -42,67 +54,174 @@ contract DoubleAuction{
         _;
     }
 
-    modifier canStartAuction {
-        require(totalDeposit == 0, 'Cannot start new auction, deposits are not empty.');
+    modifier canStartAuction(uint _auctionId) {
+        require(auctions[_auctionId].totalDeposit == 0, 'Cannot start new auction, deposits are not empty.');
         _;
     }
 
-    modifier isPlaceBidPhase {
-        require(placeBidPhase = true, 'Cannot proceed to place bid phase of the contract because contract has not started yet');
+    modifier isPlaceBidPhase(uint _auctionId) {
+        require(auctions[_auctionId].placeBidPhase, 'Cannot proceed to place bid phase of the contract because contract has not started yet');
         _;
     }
 
-    modifier isOpenBidPhase {
-        require(openBidPhase = true, 'Cannot proceed to open bid phase of the contract because place bid phase has not been completed yet');
+    modifier isOpenBidPhase(uint _auctionId) {
+        require(auctions[_auctionId].openBidPhase, 'Cannot proceed to open bid phase of the contract because place bid phase has not been completed yet');
         _;
     }
 
-    modifier isAnnounceResultPhase {
-        require(announceResultPhase = true, 'Cannot proceed to announce result phase of the contract because open bid phase has not been completed yet');
+    modifier isAnnounceResultPhase(uint _auctionId) {
+        require(auctions[_auctionId].announceResultPhase, 'Cannot proceed to announce result phase of the contract because open bid phase has not been completed yet');
         _;
     }
 
+    /* Getters */
+    function bidders(uint _auctionId, address _bidder) public view returns (bytes memory c_quantity, bytes memory c_bid_value, bytes memory sig, bytes memory ring, bytes memory tau_1, bytes memory tau_2, int bidder_type) {
+        Bidder storage bidder = auctions[_auctionId].bidders[_bidder];
+        return (bidder.c_quantity, bidder.c_bid_value, bidder.sig, bidder.ring, bidder.tau_1, bidder.tau_2, bidder.bidder_type);
+    }
+
+    function clearing(uint _auctionId) public view returns (int clearingQuantity, int clearingPrice, int clearingType) {
+        Clearing storage result = auctions[_auctionId].clearing;
+        return (result.clearingQuantity, result.clearingPrice, result.clearingType);
+    }
+
+    function deposit(uint _auctionId, address _bidder) public view returns (uint) {
+        return auctions[_auctionId].deposit[_bidder];
+    }
+
+    function allocation(uint _auctionId, address _bidder) public view returns (int) {
+        return auctions[_auctionId].allocation[_bidder];
+    }
+
+    function batchRoots(uint _auctionId) public view returns (bytes32[] memory) {
+        return auctions[_auctionId].batchRoots;
+    }
+
+    function batchSizes(uint _auctionId) public view returns (uint[] memory) {
+        return auctions[_auctionId].batchSizes;
+    }
+
+    function keyCount() public view returns (uint) {
+        return keys.length;
+    }
+
+    function totalDeposit(uint _auctionId) public view returns (uint) {
+        return auctions[_auctionId].totalDeposit;
+    }
+
     /* Functions */
-    function startAuction() public payable onlyOwner canStartAuction {
+    function registerKey(bytes memory _key) public returns (uint) {
+        keys.push(_key);
+        emit newKey(keys.length - 1, msg.sender);
+        return keys.length - 1;
+    }
+
+    function startAuction(uint _auctionId) public payable onlyOwner canStartAuction(_auctionId) {
         auctioneer = msg.sender;      /* auctioneer is the contract owner */
-        placeBidPhase = true;
+        auctions[_auctionId].placeBidPhase = true;
+        auctions[_auctionId].openBidPhase = false;
+        auctions[_auctionId].announceResultPhase = false;
     }
 
-    function endPlaceBid() public onlyOwner isPlaceBidPhase {
-        placeBidPhase = false;
-        openBidPhase = true;
+    function endPlaceBid(uint _auctionId) public onlyOwner isPlaceBidPhase(_auctionId) {
+        auctions[_auctionId].placeBidPhase = false;
+        auctions[_auctionId].openBidPhase = true;
     }
 
-    function endOpenBid() public onlyOwner isOpenBidPhase {
-        openBidPhase = false;
-        announceResultPhase = true;
+    function endOpenBid(uint _auctionId) public onlyOwner isOpenBidPhase(_auctionId) {
+        auctions[_auctionId].openBidPhase = false;
+        auctions[_auctionId].announceResultPhase = true;
     }
 
-    function placeBid(bytes memory _c_quantity, bytes memory _c_bid_value, bytes memory _sig, bytes memory _ring, int _bidder_type) public payable isPlaceBidPhase {
-        deposit[msg.sender] = msg.value;
-        totalDeposit += msg.value;
-        bidders[msg.sender].bidder_type = _bidder_type;
-        bidders[msg.sender].c_quantity = _c_quantity;
-        bidders[msg.sender].c_bid_value = _c_bid_value;
-        bidders[msg.sender].sig = _sig;
-        bidders[msg.sender].ring = _ring;
-        emit newBidder(msg.sender);
+    function placeBid(uint _auctionId, bytes memory _c_quantity, bytes memory _c_bid_value, bytes memory _sig, bytes memory _ring, int _bidder_type) public payable isPlaceBidPhase(_auctionId) {
+        Instance storage instance = auctions[_auctionId];
+        instance.deposit[msg.sender] += msg.value;
+        instance.totalDeposit += msg.value;
+        instance.bidders[msg.sender].bidder_type = _bidder_type;
+        instance.bidders[msg.sender].c_quantity = _c_quantity;
+        instance.bidders[msg.sender].c_bid_value = _c_bid_value;
+        instance.bidders[msg.sender].sig = _sig;
+        instance.bidders[msg.sender].ring = _ring;
+        emit newBidder(_auctionId, msg.sender);
     }
 
-    function openBid(bytes memory _tau_1, bytes memory _tau_2) public isOpenBidPhase {
-        bidders[msg.sender].tau_1 = _tau_1;
-        bidders[msg.sender].tau_2 = _tau_2;
+    /* Commits to a whole batch of sealed bids collected off chain, the deposit covers every bid of the batch */
+    function submitBatch(uint _auctionId, bytes32 _root, uint _size) public payable isPlaceBidPhase(_auctionId) {
+        require(_size > 0, 'A batch holds at least one bid.');
+        Instance storage instance = auctions[_auctionId];
+        instance.deposit[msg.sender] += msg.value;
+        instance.totalDeposit += msg.value;
+        instance.batchedBids[msg.sender] += _size;
+        instance.batchRoots.push(_root);
+        instance.batchSizes.push(_size);
+        emit newBatch(_auctionId, instance.batchRoots.length - 1, _root, _size);
     }
 
-    function announceClearing(int _clearingQuantity, int _clearingPrice, int _clearingType) public onlyOwner isAnnounceResultPhase  {
-        clearing.clearingPrice = _clearingPrice;
-        clearing.clearingQuantity = _clearingQuantity;
-        clearing.clearingType = _clearingType;
+    function openBid(uint _auctionId, bytes memory _tau_1, bytes memory _tau_2) public isOpenBidPhase(_auctionId) {
+        auctions[_auctionId].bidders[msg.sender].tau_1 = _tau_1;
+        auctions[_auctionId].bidders[msg.sender].tau_2 = _tau_2;
     }
 
-    function punishBidder(address bidderAddress) public onlyOwner {
-        deposit[bidderAddress] = 0;
-        totalDeposit -= deposit[bidderAddress];
+    function announceClearing(uint _auctionId, int _clearingQuantity, int _clearingPrice, int _clearingType) public onlyOwner isAnnounceResultPhase(_auctionId)  {
+        Clearing storage result = auctions[_auctionId].clearing;
+        result.clearingPrice = _clearingPrice;
+        result.clearingQuantity = _clearingQuantity;
+        result.clearingType = _clearingType;
+    }
+
+    /* Records the fills of many bidders and refunds their deposits in a single transaction */
+    function settle(uint _auctionId, address payable[] memory _bidders, int[] memory _fills) public onlyOwner isAnnounceResultPhase(_auctionId) {
+        require(_bidders.length == _fills.length, 'Every bidder must have exactly one fill.');
+        Instance storage instance = auctions[_auctionId];
+        for (uint i = 0; i < _bidders.length; i++) {
+            instance.allocation[_bidders[i]] = _fills[i];
+            uint amount = instance.deposit[_bidders[i]];
+            if (amount > 0) {
+                instance.deposit[_bidders[i]] = 0;
+                instance.totalDeposit -= amount;
+                _bidders[i].transfer(amount);
+            }
+        }
     }
-}
 
+    /* Refunds the deposit of a collector of batched bids, less one bid deposit per batched bid whose opening failed */
+    function settleBatches(uint _auctionId, address payable _collector, uint _invalid) public onlyOwner isAnnounceResultPhase(_auctionId) {
+        Instance storage instance = auctions[_auctionId];
+        uint count = instance.batchedBids[_collector];
+        require(_invalid <= count, 'Cannot forfeit more bids than were batched.');
+        uint amount = instance.deposit[_collector];
+        uint refund = count == 0 ? 0 : amount / count * (count - _invalid);
+        instance.deposit[_collector] = 0;
+        instance.batchedBids[_collector] = 0;
+        instance.totalDeposit -= amount;
+        if (refund > 0) {
+            _collector.transfer(refund);
+        }
+    }
+
+    /* Splits the value evenly between many accounts, e.g. to fund simulated bidders in bulk */
+    function fundAccounts(address payable[] memory _accounts) public payable {
+        require(_accounts.length > 0 && msg.value % _accounts.length == 0, 'Value must be split evenly.');
+        uint amount = msg.value / _accounts.length;
+        for (uint i = 0; i < _accounts.length; i++) {
+            _accounts[i].transfer(amount);
+        }
+    }
+
+    function punishBidder(uint _auctionId, address bidderAddress) public onlyOwner {
+        Instance storage instance = auctions[_auctionId];
+        instance.totalDeposit -= instance.deposit[bidderAddress];
+        instance.deposit[bidderAddress] = 0;
+    }
+
+    /* Punishes many bidders in a single transaction */
+    function punishBidders(uint _auctionId, address[] memory _bidders) public onlyOwner {
+        Instance storage instance = auctions[_auctionId];
+        uint forfeited = 0;
+        for (uint i = 0; i < _bidders.length; i++) {
+            forfeited += instance.deposit[_bidders[i]];
+            instance.deposit[_bidders[i]] = 0;
+        }
+        instance.totalDeposit -= forfeited;
+    }
+}
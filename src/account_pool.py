@@ -0,0 +1,91 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from hashlib import sha256
+from typing import Optional, List, Union
+from eth_account import Account
+
+
+# --- Constants --- #
+SECP256K1_ORDER = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141  # Private keys lie in [1, order).
+
+
+class AccountPool:
+    """
+    This class derives a deterministic pool of local Ethereum accounts from a seed, so that simulations are not
+    bounded by the number of accounts unlocked on the node. Private keys are cheap to derive, addresses are derived
+    on first use and cached. The same seed always gives the same accounts, which makes load tests reproducible.
+    The accounts must be funded before they can send transactions, see Auction.fund_accounts.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 seed: Union[str, bytes]
+                 ) -> None:
+        """
+        :param seed: Seed of the pool. Never use a pool whose seed is known on a public network.
+        """
+        logging.info('Creating account pool.')
+        self.__seed = seed.encode('utf-8') if isinstance(seed, str) else seed
+        self.__addresses = {}  # Account index -> address.
+        self.__next = 0  # First account which has not been handed out yet.
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def private_key(self,
+                    index: int
+                    ) -> str:
+        """
+        :param index: Index of the account in the pool.
+        :return: Private key of the account, hex encoded.
+        """
+        counter = 0
+        while True:
+            digest = sha256(self.__seed + index.to_bytes(8, 'big') + counter.to_bytes(4, 'big')).digest()
+            if 0 < int.from_bytes(digest, 'big') < SECP256K1_ORDER:
+                return '0x' + digest.hex()
+
+            counter += 1
+
+    def address(self,
+                index: int
+                ) -> str:
+        """
+        :param index: Index of the account in the pool.
+        :return: Checksum address of the account.
+        """
+        if index not in self.__addresses:
+            self.__addresses[index] = Account.from_key(self.private_key(index)).address
+
+        return self.__addresses[index]
+
+    def take(self,
+             count: int
+             ) -> List[int]:
+        """
+        Hands out accounts which have not been handed out yet.
+        :param count: Number of accounts.
+        :return: Indices of the accounts in the pool.
+        """
+        indices = list(range(self.__next, self.__next + count))
+        self.__next += count
+        logging.info(f'Accounts {indices[0] if indices else self.__next} to {self.__next - 1} handed out.')
+        return indices
+
+    def reset(self,
+              start: Optional[int] = 0
+              ) -> None:
+        """
+        Hands accounts out again from index start on, e.g. to reuse funded accounts for a new simulation.
+        """
+        self.__next = start
+
+    def __len__(self) -> int:
+        """
+        :return: Number of accounts handed out.
+        """
+        return self.__next
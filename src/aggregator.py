@@ -0,0 +1,168 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from typing import Optional, List, Tuple, Any
+from sys import byteorder
+
+from src.helpers.utils.crypto import parse, commit_verify, FORMAT_V2_TAG
+from src.helpers.utils.merkle import merkle_leaf, merkle_tree, merkle_proof
+
+
+def bid_leaf(identifier: str,
+             c_quantity: bytes,
+             c_bid_value: bytes,
+             sig: bytes,
+             ring: bytes,
+             bidder_type: int
+             ) -> bytes:
+    """
+    :return: Merkle leaf committing to a sealed bid.
+    """
+    return merkle_leaf(identifier.encode('utf-8'), c_quantity, c_bid_value, sig, ring,
+                       bidder_type.to_bytes(int(256 / 8), byteorder, signed=True))
+
+
+def opening_matches(sig: bytes,
+                    tau_1: bytes,
+                    tau_2: bytes
+                    ) -> bool:
+    """
+    Checks the opening tokens of a sealed bid against the commitments c1 carried by its signature, without any RSA
+    work. See Auctioneer.bid_opening.
+    :return: Whether the tokens open the commitments of the bid.
+    """
+    fields = parse(sig)
+    if fields[0] == FORMAT_V2_TAG:
+        tokens = [(tau_1, fields[2])] if len(fields) == 3 and tau_2 == b'' else None
+    else:
+        tokens = [(tau_1, fields[2]), (tau_2, fields[3])] if len(fields) == 4 else None
+
+    if tokens is None:
+        return False
+
+    openings = [(parse(tau), c1) for tau, c1 in tokens]
+    return all(len(opening) == 2 and commit_verify(*opening, c1) for opening, c1 in openings)
+
+
+class Aggregator:
+    """
+    This class handles an off-chain collector. It batches sealed bids and only the Merkle root of every batch is
+    posted on chain, each bidder receiving an inclusion proof of its bid.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 batch_size: Optional[int] = 256
+                 ) -> None:
+        """
+        :param batch_size: Max number of bids committed under one Merkle root. If None, every seal commits the bids
+        collected since the previous one under a single root.
+        """
+        logging.info('Creating aggregator.')
+        self.batch_size = batch_size
+        self.__batches = []  # Every batch holds its bids, opening tokens and, once sealed, its Merkle tree.
+        self.__roots = {}  # Merkle root -> batch index, for sealed batches.
+        self.__identifiers = set()  # Identifiers of the collected bids.
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def collect(self,
+                identifier: str,
+                c_quantity: bytes,
+                c_bid_value: bytes,
+                sig: bytes,
+                ring: bytes,
+                bidder_type: int
+                ) -> Tuple[int, int]:
+        """
+        Adds a sealed bid to the current batch.
+        :param identifier: Off-chain identifier of the bidder, unique among the collected bids.
+        :return: Batch and position of the bid in the batch.
+        """
+        if identifier in self.__identifiers:
+            raise ValueError(f'A bid of {identifier} is already collected.')
+
+        self.__identifiers.add(identifier)
+        if not self.__batches or self.__batches[-1]['tree'] is not None \
+                or len(self.__batches[-1]['bids']) == self.batch_size:
+            self.__batches.append({'bids': [], 'taus': [], 'tree': None})
+
+        batch = self.__batches[-1]
+        batch['bids'].append((identifier, c_quantity, c_bid_value, sig, ring, bidder_type))
+        batch['taus'].append((b'', b''))
+        return len(self.__batches) - 1, len(batch['bids']) - 1
+
+    def seal(self) -> List[Tuple[int, bytes, int]]:
+        """
+        Builds the Merkle tree of every batch which is not sealed yet.
+        :return: Index, Merkle root and size of the newly sealed batches, to be posted on chain.
+        """
+        sealed = []
+        for index, batch in enumerate(self.__batches):
+            if batch['tree'] is None:
+                batch['tree'] = merkle_tree([bid_leaf(*bid) for bid in batch['bids']])
+                self.__roots[batch['tree'][-1][0]] = index
+                sealed.append((index, batch['tree'][-1][0], len(batch['bids'])))
+
+        logging.info(f'{len(sealed)} batches sealed.')
+        return sealed
+
+    def proof(self,
+              batch: int,
+              position: int
+              ) -> Tuple[bytes, int, List[bytes]]:
+        """
+        :param batch: Batch of the bid.
+        :param position: Position of the bid in the batch.
+        :return: Inclusion proof of the bid: Merkle root, position and siblings.
+        """
+        tree = self.__batches[batch]['tree']
+        return tree[-1][0], position, merkle_proof(tree, position)
+
+    def open(self,
+             root: bytes,
+             position: int,
+             tau_1: bytes,
+             tau_2: bytes
+             ) -> None:
+        """
+        Stores the opening tokens of a bid, to be handed over to the auctioneer. Tokens which do not open the
+        commitments of the bid are refused, as are new tokens for a bid which is already opened.
+        :param root: Merkle root of the batch of the bid, as given in its inclusion proof.
+        :param position: Position of the bid in the batch.
+        :param tau_1: Opening token for quantity.
+        :param tau_2: Opening token for bid value.
+        """
+        batch = self.__batches[self.__roots[root]]
+        if not 0 <= position < len(batch['bids']):
+            raise IndexError(f'No bid at position {position} of the batch.')
+
+        if batch['taus'][position] != (b'', b''):
+            raise ValueError('bid is already opened')
+
+        if not opening_matches(batch['bids'][position][3], tau_1, tau_2):
+            raise ValueError('opening does not match the commitments of the bid')
+
+        batch['taus'][position] = (tau_1, tau_2)
+
+    def bids(self) -> List[Tuple[Any, ...]]:
+        """
+        :return: Sealed bids of every sealed batch with their opening tokens and inclusion proofs:
+        (identifier, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type, root, position, proof).
+        """
+        bids = []
+        for batch in self.__batches:
+            if batch['tree'] is None:
+                continue
+
+            root = batch['tree'][-1][0]
+            for position, ((identifier, c_quantity, c_bid_value, sig, ring, bidder_type), (tau_1, tau_2)) \
+                    in enumerate(zip(batch['bids'], batch['taus'])):
+                bids.append((identifier, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type,
+                             root, position, merkle_proof(batch['tree'], position)))
+
+        return bids
@@ -0,0 +1,105 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from typing import Dict, List, Tuple, Any
+import numpy as np
+
+
+def order_book(bidders: Dict[str, Dict[str, Any]]
+               ) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Turns the opened bids of the auctioneer into columns. Bids whose opening failed are left out.
+    :param bidders: Opened bids, as stored in Auctioneer.bidders.
+    :return: Addresses, bid values, quantities and types of the valid bids.
+    """
+    addresses = [address for address, bid in bidders.items() if bid['status']]
+    price = np.fromiter((bidders[address]['bid_value'] for address in addresses), dtype=np.int64, count=len(addresses))
+    quantity = np.fromiter((bidders[address]['quantity'] for address in addresses), dtype=np.int64,
+                           count=len(addresses))
+    bidder_type = np.fromiter((bidders[address]['bidder_type'] for address in addresses), dtype=np.int64,
+                              count=len(addresses))
+    return addresses, price, quantity, bidder_type
+
+
+def allocate(price: np.ndarray,
+             quantity: np.ndarray,
+             bidder_type: np.ndarray,
+             clearing_quantity: int
+             ) -> np.ndarray:
+    """
+    Computes the quantity traded by every bidder. On each side, price levels are filled by priority (highest buyers,
+    lowest sellers) until the clearing quantity is reached, the marginal price level being shared pro-rata.
+    :param price: Bid values.
+    :param quantity: Quantities.
+    :param bidder_type: Types of the bidders, 0 for sellers and 1 for buyers.
+    :param clearing_quantity: Quantity traded in the auction.
+    :return: Fill of every bidder.
+    """
+    fills = np.zeros(len(price), dtype=np.int64)
+    sellers = bidder_type == 0
+    buyers = ~sellers
+    fills[buyers] = allocate_side(price[buyers], quantity[buyers], clearing_quantity, descending=True)
+    fills[sellers] = allocate_side(price[sellers], quantity[sellers], clearing_quantity, descending=False)
+    logging.debug(f'Fills: {fills}.')
+    return fills
+
+
+def allocate_bidders(bidders: Dict[str, Dict[str, Any]],
+                     clearing_quantity: int
+                     ) -> Tuple[List[str], List[int]]:
+    """
+    :param bidders: Opened bids, as stored in Auctioneer.bidders.
+    :param clearing_quantity: Quantity traded in the auction.
+    :return: Addresses of the valid bidders and their fills.
+    """
+    addresses, price, quantity, bidder_type = order_book(bidders)
+    return addresses, allocate(price, quantity, bidder_type, clearing_quantity).tolist()
+
+
+def allocate_side(price: np.ndarray,
+                  quantity: np.ndarray,
+                  clearing_quantity: int,
+                  descending: bool
+                  ) -> np.ndarray:
+    """
+    Fills one side of the book. Within the marginal level, fills are rounded down and the remaining units go to the
+    largest remainders so that the side trades exactly the clearing quantity.
+    :param price: Bid values of the side.
+    :param quantity: Quantities of the side.
+    :param clearing_quantity: Quantity traded in the auction.
+    :param descending: Whether higher prices have priority (buyers) or lower prices (sellers).
+    :return: Fills of the side.
+    """
+    n = len(price)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    order = np.argsort(-price if descending else price, kind='stable')
+    sorted_price = price[order]
+    sorted_quantity = quantity[order]
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_price)) + 1))
+    level = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    level_quantity = np.add.reduceat(sorted_quantity, starts)
+    level_fill = np.clip(clearing_quantity - (np.cumsum(level_quantity) - level_quantity), 0, level_quantity)
+
+    fill = level_fill[level]
+    if sorted_quantity.max() > np.iinfo(np.int64).max // max(int(level_fill.max()), 1):
+        fill = fill.astype(object)  # Products of large quantities overflow 64 bits, exact integers instead.
+
+    exact = sorted_quantity * fill
+    divisor = np.maximum(level_quantity, 1)[level]
+    fills = (exact // divisor).astype(np.int64)
+    remainder = (exact % divisor).astype(np.int64)
+    leftover = level_fill - np.add.reduceat(fills, starts)
+
+    by_remainder = np.lexsort((-remainder, level))
+    rank = np.arange(n) - starts[level[by_remainder]]
+    fills[by_remainder] += rank < leftover[level[by_remainder]]
+
+    side_fills = np.empty(n, dtype=np.int64)
+    side_fills[order] = fills
+    return side_fills
@@ -1,23 +1,23 @@
 import logging
 from pathlib import Path
 
-import solcx
 from web3 import Web3
 from json import loads, dump
 from solcx import compile_standard
-from random import randint, getrandbits, sample
-from sys import byteorder
-from typing import Optional, Any, Union, List
-from hexbytes import HexBytes
-import json
-from web3 import Web3, HTTPProvider
-from cryptocompare import get_price
+from random import sample
+from typing import Optional, Any, List, Dict, Tuple
 from Crypto.PublicKey import RSA
-from csv import writer
+from src.account_pool import AccountPool
 from src.auctioneer import Auctioneer
+from src.aggregator import Aggregator
+from src.auction_pool import AuctionPool
+from src.bidder import Bidder
 from src.helpers.utils.file_helper import get_bidders
-from src.helpers.utils.crypto import parse
+from src.helpers.utils.crypto import FORMAT_V1
 from src.participant import Participant
+from src.key_registry import KeyRegistry
+from src.order_book import OrderBook
+from src.transaction_builder import TransactionBuilder
 
 
 class Auction:
@@ -27,17 +27,37 @@ class Auction:
 
     # --- Constants --- #
     DEPOSIT = 1000000000000000000  # 1 ETH deposit expressed in Wei.
+    SETTLEMENT_BATCH_SIZE = 100  # Max number of bidders settled in one transaction, bounded by the block gas limit.
+    PUNISHMENT_BATCH_SIZE = 200  # Max number of bidders punished in one transaction.
+    FUNDING_BATCH_SIZE = 200  # Max number of accounts funded in one transaction.
+    BIDDER_FUNDS = 2 * DEPOSIT  # Funds of a pool account: its deposit and the gas of its transactions.
 
     # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
-    def __init__(self) -> None:
+    def __init__(self,
+                 private_keys: Optional[List[str]] = None,
+                 provider: Optional[Any] = None,
+                 account_pool: Optional[AccountPool] = None
+                 ) -> None:
+        """
+        :param private_keys: Private keys of the accounts whose transactions are signed locally instead of by the node.
+        :param provider: Web3 provider, e.g. an in-process EthereumTesterProvider. Defaults to the local Ganache node.
+        :param account_pool: If set, bidders get local accounts from the pool, funded by the auctioneer, instead of
+        the accounts unlocked on the node.
+        """
         logging.info('Creating Auction object.')
         self.__contract = None
-        self.__w3 = Web3(Web3.HTTPProvider('http://127.0.0.1:9545'))
+        self.__w3 = Web3(provider or Web3.HTTPProvider('http://127.0.0.1:9545'))
         self.__abi = None
         self.__is_deployed = False
         self.__auctioneer = None
-        self.__bidders = []
+        self.__auctions = {}  # Bidders, bidder addresses and result of every auction instance, keyed by auction ID.
+        self.__indices = None
         self.__number_of_tx = 0
+        self.__private_keys = private_keys or []
+        self.__builder = None
+        self.__account_pool = account_pool
+        self.__registry = KeyRegistry()  # Local mirror of the public key registry of the smart contract.
+        self.__new_bidder_filter = None  # Created once, its entries are consumed by every run.
         logging.info('Auction object created.')
 
     # --------------------------------------------------- METHODS --------------------------------------------------- #
@@ -49,34 +69,8 @@ class Auction:
         Credit: https://github.com/ethereum/py-solc
         """
         logging.info('Deploying Auction smart contract on chain.')
-        logging.info('Compiling smart contract source code into bytecode using solc.')
-        contract_path = Path.cwd() / 'contracts' / 'Double_Auction.sol'
-        logging.info(f'Contract path: {contract_path}.')
-        compiled = compile_standard(
-            {
-                'language': 'Solidity',
-                'sources': {
-                    'Double_Auction.sol': {
-                        'urls': [str(contract_path)]
-                    }
-                },
-                'settings': {
-                    'outputSelection': {
-                        '*': {
-                            '*': [
-                                'metadata',
-                                'evm.bytecode',
-                                'evm.bytecode.sourceMap'
-                            ]
-                        }
-                    }
-                }
-            },
-            allow_paths=str(contract_path)
-        )
+        self.__abi, bytecode = Auction.compile()
         self.__w3.eth.defaultAccount = self.__w3.eth.accounts[0]  # First account is default account.
-        bytecode = compiled['contracts']['Double_Auction.sol']['DoubleAuction']['evm']['bytecode']['object']
-        self.__abi = loads(compiled['contracts']['Double_Auction.sol']['DoubleAuction']['metadata'])['output']['abi']
         logging.info('Creating temporary contract object.')
         temp_contract = self.__w3.eth.contract(abi=self.__abi, bytecode=bytecode)
         logging.info('Transacting contract on the chain.')
@@ -105,135 +99,600 @@ class Auction:
                                                  abi=self.__abi,
                                                  bytecode=bytecode)
         logging.info('Connected to smart contract.')
+        self.__builder = TransactionBuilder(self.__w3, self.__contract)
+        for private_key in self.__private_keys:
+            self.__builder.add_account(private_key)
+
         self.__is_deployed = True
         print('Auction smart contract successfully deployed.')
 
-    def proof_of_concept(self
-                         ) -> None:
+    @staticmethod
+    def compile(contract_path: Optional[Path] = None
+                ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Compiles the Auction smart contract using solc.
+        :param contract_path: Path of the contract source. Defaults to contracts/Double_Auction.sol.
+        :return: ABI and bytecode of the contract.
+        """
+        logging.info('Compiling smart contract source code into bytecode using solc.')
+        if contract_path is None:
+            contract_path = Path.cwd() / 'contracts' / 'Double_Auction.sol'
+
+        logging.info(f'Contract path: {contract_path}.')
+        compiled = compile_standard(
+            {
+                'language': 'Solidity',
+                'sources': {
+                    'Double_Auction.sol': {
+                        'urls': [str(contract_path)]
+                    }
+                },
+                'settings': {
+                    'outputSelection': {
+                        '*': {
+                            '*': [
+                                'metadata',
+                                'evm.bytecode',
+                                'evm.bytecode.sourceMap'
+                            ]
+                        }
+                    }
+                }
+            },
+            allow_paths=str(contract_path)
+        )
+        bytecode = compiled['contracts']['Double_Auction.sol']['DoubleAuction']['evm']['bytecode']['object']
+        abi = loads(compiled['contracts']['Double_Auction.sol']['DoubleAuction']['metadata'])['output']['abi']
+        return abi, bytecode
+
+    def proof_of_concept(self,
+                         auction_ids: Optional[List[int]] = None,
+                         processes: Optional[int] = None,
+                         batch_size: Optional[int] = None,
+                         format_version: Optional[int] = FORMAT_V1,
+                         order_book_dir: Optional[Path] = None,
+                         bidder_file: Optional[Path] = Path('bidders.json'),
+                         bidders_number: Optional[int] = 6,
+                         ring_size: Optional[int] = None,
+                         pool: Optional[AuctionPool] = None
+                         ) -> Dict[int, Dict[str, Any]]:
         """
-        This method implements the proof of concept.
-        :param show_total_price: Flag indicating total price of auction for each participant should be displayed.
+        This method implements the proof of concept. Every auction instance runs its own phases and clearing on the
+        same smart contract, the opening and clearing of the instances are spread over a pool of processes.
+        :param auction_ids: IDs of the auction instances to be run, e.g. one per grid zone and trading interval.
+        Defaults to a single auction with ID 0.
+        :param processes: Number of processes opening and clearing the auctions. Defaults to the number of CPUs.
+        :param batch_size: If set, bids are collected by an aggregator which only posts one Merkle root per batch of
+        batch_size bids instead of one transaction per bidder.
+        :param format_version: Bid format, FORMAT_V2 uses one ring signature for both quantity and bid value.
+        :param order_book_dir: If set, opened bids are written to one memory-mapped order book per auction instance
+        in this directory, so that the clearing of large auctions is not bounded by RAM.
+        :param bidder_file: File in which the bidder data is stored.
+        :param bidders_number: Number of bidders generated if bidder_file does not exist.
+        :param ring_size: Number of keys in every ring. Defaults to a random size, bound it for large simulations.
+        :param pool: Running auction pool to be used, e.g. kept warm across trading intervals. Defaults to a pool
+        created for this run.
+        :return: Opening and clearing of every auction instance, see clear.
+        """
+        if auction_ids is None:
+            auction_ids = [0]
+
+        # --- Deploying Smart Contract and generating auctioneer --- #
+        self.setup()
+
+        print('Simulating anonymous sealed-bid auction protocol...')
+        # --- Generating bidders --- #
+        bidders = {auction_id: self.create_bidders(auction_id, bidder_file, bidders_number, ring_size)
+                   for auction_id in auction_ids}
+
+        return self.run_auctions(bidders, processes, batch_size, format_version, order_book_dir, pool)
+
+    def run_auctions(self,
+                     bidders: Dict[int, List[Bidder]],
+                     processes: Optional[int] = None,
+                     batch_size: Optional[int] = None,
+                     format_version: Optional[int] = FORMAT_V1,
+                     order_book_dir: Optional[Path] = None,
+                     pool: Optional[AuctionPool] = None
+                     ) -> Dict[int, Dict[str, Any]]:
+        """
+        Runs auction instances whose bidders are already created and registered, e.g. the same bidders in every
+        trading interval: starts the instances, places and opens the bids, then clears them. See proof_of_concept.
+        :param bidders: Bidders of every auction instance, keyed by auction ID.
+        :return: Opening and clearing of every auction instance, see clear.
+        """
+        auction_ids = list(bidders)
+        for auction_id, auction_bidders in bidders.items():
+            self.__instance(auction_id)['bidders'] = auction_bidders
+
+        # --- Setting up filters --- #
+        if self.__new_bidder_filter is None:
+            self.__new_bidder_filter = self.__contract.events.newBidder.createFilter(fromBlock='latest')
+
+        # --- Starting auctions and placing bids --- #
+        for auction_id in auction_ids:
+            self.start(auction_id)
+            self.place_bids(auction_id, batch_size, format_version)
+
+        # --- Opening bids --- #
+        for auction_id in auction_ids:
+            self.open_bids(auction_id)
+
+        for event in self.__new_bidder_filter.get_new_entries():
+            auction_id = event['args']['auctionId']
+            new_bidder_address = event['args']['newBidderAddress']
+            event_name = event['event']
+            logging.info(f'Catching event {event_name} from bidder at {new_bidder_address} in auction {auction_id}.')
+            if auction_id in self.__auctions:
+                self.__auctions[auction_id]['addresses'].append(new_bidder_address)
+
+        for auction_id in auction_ids:
+            # A bidder placing its bid more than once emits one event per bid but holds a single sealed bid.
+            addresses = self.__auctions[auction_id]['addresses']
+            self.__auctions[auction_id]['addresses'] = list(dict.fromkeys(addresses))
+
+        return self.clear(auction_ids, processes, order_book_dir, pool)
+
+    def setup(self,
+              key: Optional[bytes] = None
+              ) -> Auctioneer:
+        """
+        Deploys the smart contract if needed, creates the auctioneer and registers its key.
+        :param key: PEM export of the private key of the auctioneer, e.g. kept across restarts. Defaults to a new key.
+        :return: The auctioneer.
         """
-        # --- Deploying Smart Contract --- #
         if not self.__is_deployed:
             logging.info('Deploying smart contract.')
             self.deploy()
 
-        # --- Getting bidders indices --- #
-        bidders_dic = None
-        for entry in self.__abi:
-            try:
-                if entry['name'] == 'bidders':
-                    bidders_dic = entry
-                    break
-
-            except KeyError:
-                pass
-
-        outputs = bidders_dic['outputs']
-        indices = {}
-        for index, output in enumerate(outputs):
-            indices[output['name']] = index
-
-        c_quantity_index = indices['c_quantity']
-        c_bid_value_index = indices['c_bid_value']
-        sig_index = indices['sig']
-        ring_index = indices['ring']
-        bidder_type_index = indices['bidder_type']
-        tau_1_index = indices['tau_1']
-        tau_2_index = indices['tau_2']
+        if self.__auctioneer is None:
+            self.__auctioneer = Auctioneer(address=self.__w3.eth.defaultAccount, generate_new_keys=key is None)
+            if key is not None:
+                self.__auctioneer.import_key(key)
 
-        # --- Setting up filters --- #
-        new_bidder_filter = self.__contract.events.newBidder.createFilter(fromBlock='latest')
+            print(f'Auctioneer created: {self.__auctioneer}.')
+            self.register_keys([self.__auctioneer])
 
-        print('Simulating anonymous sealed-bid auction protocol...')
-        # --- Generating auctioneer and bidders --- #
-        self.__auctioneer = Auctioneer(address=self.__w3.eth.defaultAccount)
-        print(f'Auctioneer created: {self.__auctioneer}.')
-        self.__bidders = get_bidders(Path('bidders.json'))  # If new file is created,
-        # max number of bidders must be < number of accounts on the blockchain.
-        pub_keys = list(map(lambda b: b.public_key, self.__bidders)) # function is first argument of map while __bidders is the second one
+        return self.__auctioneer
+
+    def clear(self,
+              auction_ids: List[int],
+              processes: Optional[int] = None,
+              order_book_dir: Optional[Path] = None,
+              pool: Optional[AuctionPool] = None
+              ) -> Dict[int, Dict[str, Any]]:
+        """
+        Opens and clears auction instances whose open bid phase is over, then announces and settles their clearing.
+        :param auction_ids: IDs of the auction instances.
+        :param processes: Number of processes opening and clearing the auctions. Defaults to the number of CPUs.
+        :param order_book_dir: If set, opened bids are written to on-disk order books in this directory.
+        :param pool: Running auction pool to be used. Defaults to a pool of processes created for this call.
+        :return: Opening and clearing of every auction instance, as computed by the auction pool.
+        """
+        bids = {auction_id: self.fetch_bids(auction_id) for auction_id in auction_ids}
+        roots = {auction_id: dict(zip(self.__call('batchRoots', auction_id), self.__call('batchSizes', auction_id)))
+                 for auction_id in auction_ids}
+        keys = {auction_id: self.__registry.ring_pems(map(lambda bid: bid[1], bids[auction_id]))
+                for auction_id in auction_ids}
+
+        # --- Opening bids and getting clearing information --- #
+        logging.info('Opening bids and getting uniform prices.')
+        book_dir = None if order_book_dir is None else str(order_book_dir)
+        if pool is not None:
+            results = pool.run(bids, roots, keys, book_dir)
+
+        else:
+            with AuctionPool(self.__auctioneer, processes) as pool:
+                results = pool.run(bids, roots, keys, book_dir)
+
+        # --- Announce clearing information --- #
+        for auction_id in auction_ids:
+            self.announce(auction_id, results[auction_id])
+            self.settle(auction_id, results[auction_id])
+            print(f'Auction {auction_id}: {self.__call("clearing", auction_id)}')
+
+        return results
+
+    def create_bidders(self,
+                       auction_id: Optional[int],
+                       bidder_file: Optional[Path] = Path('bidders.json'),
+                       bidders_number: Optional[int] = 6,
+                       ring_size: Optional[int] = None
+                       ) -> List[Bidder]:
+        """
+        Creates the bidders of an auction instance, assigns them an account, builds their rings and registers their
+        keys.
+        :param auction_id: ID of the auction instance. If None, the bidders are kept for later runs, see run_auctions.
+        :param bidder_file: File in which the bidder data is stored.
+        :param bidders_number: Number of bidders generated if bidder_file does not exist.
+        :param ring_size: Number of keys in every ring. Defaults to a random size.
+        :return: The bidders of the auction instance.
+        """
+        bidders = get_bidders(bidder_file, bidders_number)
+        pub_keys = list(map(lambda b: b.public_key, bidders)) # function is first argument of map while bidders is the second one
         pub_keys.append(self.__auctioneer.public_key)
-        bidder_addresses = sample(self.__w3.eth.accounts[1:], len(self.__bidders))
-        # Randomly picks n = len(self.__bidders) addresses out of the accounts list.
-        # Element zero is excluded because it is auctioneer address.
-        for (index, bidder) in enumerate(self.__bidders):
+        if self.__account_pool is not None:
+            bidder_addresses = self.__pool_accounts(len(bidders))
+
+        else:
+            # Without an account pool, max number of bidders must be < number of accounts on the blockchain.
+            bidder_addresses = sample(self.__w3.eth.accounts[1:], len(bidders))
+            # Randomly picks n = len(bidders) addresses out of the accounts list.
+            # Element zero is excluded because it is auctioneer address.
+
+        for (index, bidder) in enumerate(bidders):
             bidder.address = bidder_addresses[index]
             bidder.auctioneer_pub_key = self.__auctioneer.public_key
-            bidder.make_ring(pub_keys) # create a ring for every bidder
+            bidder.make_ring(pub_keys, ring_size) # create a ring for every bidder
+
+        self.register_keys(bidders)
+        logging.debug(f'Bidders created for auction {auction_id}: {bidders}.')
+        if auction_id is not None:
+            self.__instance(auction_id)['bidders'] = bidders
 
-        logging.debug(f'Bidders created: {self.__bidders}.')
+        return bidders
 
-        # --- Starting auction --- #
-        logging.info('Starting auction.')
+    def fund_accounts(self,
+                      addresses: List[str],
+                      amount: int
+                      ) -> None:
+        """
+        Sends amount Wei to every account, FUNDING_BATCH_SIZE accounts per transaction.
+        :param addresses: Accounts to be funded.
+        :param amount: Funds per account, in Wei.
+        """
+        for start in range(0, len(addresses), Auction.FUNDING_BATCH_SIZE):
+            batch = addresses[start:start + Auction.FUNDING_BATCH_SIZE]
+            logging.info(f'Funding accounts {start} to {start + len(batch) - 1}.')
+            tx = {
+                'from': self.__auctioneer.address,
+                'value': amount * len(batch)
+            }
+            self.__send_transaction(tx, 'fundAccounts', batch)
+
+    def register_keys(self,
+                      participants: List[Participant]
+                      ) -> None:
+        """
+        Registers the public key of every participant once in the key registry of the smart contract, so that rings
+        can refer to keys by their registry index, and synchronises the local mirror of the registry.
+        :param participants: Participants whose keys are to be registered.
+        """
+        for participant in participants:
+            if participant.public_key not in self.__registry:
+                logging.info(f'Registering public key of {participant}.')
+                self.__send_transaction({'from': participant.address}, 'registerKey',
+                                        participant.public_key.exportKey())
+
+        self.__registry.sync(self.__contract)
+
+    def register_key(self,
+                     pem: bytes
+                     ) -> int:
+        """
+        Registers a public key on behalf of a participant which holds no Ethereum account, the auctioneer sending the
+        transaction.
+        :param pem: PEM export of the public key.
+        :return: Registry index of the key.
+        """
+        key = RSA.importKey(pem)
+        if key not in self.__registry:
+            logging.info('Registering public key on behalf of a participant.')
+            self.__send_transaction({'from': self.__auctioneer.address}, 'registerKey', key.publickey().exportKey())
+            self.__registry.sync(self.__contract)
+
+        return self.__registry.index_of(key)
+
+    def start(self,
+              auction_id: int
+              ) -> None:
+        """
+        Starts an auction instance.
+        :param auction_id: ID of the auction instance.
+        """
+        logging.info(f'Starting auction {auction_id}.')
         tx = {
             'from': self.__auctioneer.address,
             'value': 0
         }
-        self.__send_transaction(tx, 'startAuction')
-        print("Auctioneer send transaction to initialise the contract!")
+        self.__send_transaction(tx, 'startAuction', auction_id)
+        print(f'Auctioneer send transaction to initialise auction {auction_id}!')
 
-        # --- Placing bids --- #
-        for bidder in self.__bidders:
-            logging.info(f'Placing bid for bidder {bidder}.')
-            c_quantity, c_bid_value, sig = bidder.bid()
+    def place_bids(self,
+                   auction_id: int,
+                   batch_size: Optional[int] = None,
+                   format_version: Optional[int] = FORMAT_V1
+                   ) -> None:
+        """
+        Places the sealed bids of the bidders of an auction instance and closes its place bid phase.
+        :param auction_id: ID of the auction instance.
+        :param batch_size: If set, bids are handed over to an aggregator and committed in batches of batch_size bids.
+        :param format_version: Bid format, see Bidder.bid.
+        """
+        if batch_size is not None:
+            self.__place_batched_bids(auction_id, batch_size, format_version)
+            return
+
+        for bidder in self.__auctions[auction_id]['bidders']:
+            logging.info(f'Placing bid for bidder {bidder} in auction {auction_id}.')
+            c_quantity, c_bid_value, sig = bidder.bid(format_version)
             tx = {
                 'from': bidder.address,
                 'value': Auction.DEPOSIT
             }
-            self.__send_transaction(tx, 'placeBid', c_quantity, c_bid_value, sig, bidder.export_ring(),  bidder.bidder_type)
+            self.__send_transaction(tx, 'placeBid', auction_id, c_quantity, c_bid_value, sig,
+                                    bidder.export_ring(self.__registry), bidder.bidder_type)
 
-        # --- Opening bids --- #
-        for bidder in self.__bidders:
+        self.end_place_bid(auction_id)
+
+    def submit_bids(self,
+                    auction_id: int,
+                    bids: List[Tuple[str, bytes, bytes, bytes, bytes, int]],
+                    batch_size: Optional[int] = None
+                    ) -> List[Tuple[bytes, int, List[bytes]]]:
+        """
+        Hands sealed bids over to the aggregator of an auction instance, which posts their Merkle root on chain. The
+        auctioneer deposits on behalf of the bidders.
+        :param auction_id: ID of the auction instance.
+        :param bids: Sealed bids (identifier, c_quantity, c_bid_value, sig, ring, bidder_type).
+        :param batch_size: Max number of bids per batch of the aggregator created on first use, e.g. the batch size of
+        the gateway. Defaults to one batch per call, whatever its number of bids.
+        :return: Inclusion proof of every bid.
+        """
+        instance = self.__instance(auction_id)
+        if instance['aggregator'] is None:
+            instance['aggregator'] = Aggregator(batch_size)
+
+        aggregator = instance['aggregator']
+        positions = [aggregator.collect(*bid) for bid in bids]
+        for batch, root, size in aggregator.seal():
+            logging.info(f'Posting root of batch {batch} ({size} bids) for auction {auction_id}.')
+            tx = {
+                'from': self.__auctioneer.address,
+                'value': Auction.DEPOSIT * size
+            }
+            self.__send_transaction(tx, 'submitBatch', auction_id, root, size)
+
+        return [aggregator.proof(batch, position) for batch, position in positions]
+
+    def open_batched_bid(self,
+                         auction_id: int,
+                         root: bytes,
+                         position: int,
+                         tau_1: bytes,
+                         tau_2: bytes
+                         ) -> None:
+        """
+        Hands the opening tokens of a bid submitted with submit_bids over to the aggregator, see Aggregator.open.
+        :param auction_id: ID of the auction instance.
+        :param root: Merkle root of the batch of the bid, as given in its inclusion proof.
+        :param position: Position of the bid in the batch.
+        :param tau_1: Opening token for quantity.
+        :param tau_2: Opening token for bid value.
+        """
+        aggregator = self.__auctions.get(auction_id, {}).get('aggregator')
+        if aggregator is None:
+            raise KeyError(f'Auction {auction_id} has no batched bids.')
+
+        aggregator.open(root, position, tau_1, tau_2)
+
+    def end_place_bid(self,
+                      auction_id: int
+                      ) -> None:
+        """
+        Closes the place bid phase of an auction instance.
+        :param auction_id: ID of the auction instance.
+        """
+        self.__send_transaction({'from': self.__auctioneer.address}, 'endPlaceBid', auction_id)
+
+    def end_open_bid(self,
+                     auction_id: int
+                     ) -> None:
+        """
+        Closes the open bid phase of an auction instance.
+        :param auction_id: ID of the auction instance.
+        """
+        self.__send_transaction({'from': self.__auctioneer.address}, 'endOpenBid', auction_id)
+
+    def open_bids(self,
+                  auction_id: int
+                  ) -> None:
+        """
+        Sends the opening tokens of the bidders of an auction instance and closes its open bid phase. Tokens of
+        batched bids are handed over to the aggregator instead.
+        :param auction_id: ID of the auction instance.
+        """
+        aggregator = self.__auctions[auction_id]['aggregator']
+        for bidder in self.__auctions[auction_id]['bidders']:
             tau_1 = bidder.tau_1
             tau_2 = bidder.tau_2
+            if aggregator is not None:
+                try:
+                    aggregator.open(*bidder.inclusion_proof[:2], tau_1, tau_2)
+
+                except ValueError as e:
+                    logging.info(f'Opening of bidder {bidder} refused by the aggregator: {e}.')
+
+                continue
+
             tx = {
                 'from': bidder.address
             }
-            self.__send_transaction(tx, 'openBid', tau_1, tau_2)
+            self.__send_transaction(tx, 'openBid', auction_id, tau_1, tau_2)
 
-        for event in new_bidder_filter.get_new_entries():
-            new_bidder_address = event['args']['newBidderAddress']
-            event_name = event['event']
-            logging.info(f'Catching event {event_name} from bidder at {new_bidder_address}.')
-            self.__auctioneer.bidders[new_bidder_address] = None
-
-        for bidder_address in self.__auctioneer.bidders.keys():
-            bidder = self.__call('bidders', bidder_address)
-            c_quantity = bidder[c_quantity_index]
-            c_bid_value = bidder[c_bid_value_index]
-            sig = bidder[sig_index]
-            tau_1 = bidder[tau_1_index]
-            tau_2 = bidder[tau_2_index]
-            bidder_type = bidder[bidder_type_index]
-
-            ring = list(map(lambda key: RSA.importKey(key), parse(bidder[ring_index]))) ########???????
-            logging.info(f'Opening bid for bidder at {bidder_address}.')
-            if self.__auctioneer.bid_opening(bidder_address, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type):
-                logging.info(f'Bid opening successful for bidder at {bidder_address}.')
-            else:
-                logging.info(f'Bid opening failed, punishing bidder at {bidder_address}.')
-                self.__auctioneer.bidders.pop(bidder_address, None)
-                tx = {
-                    'from': self.__auctioneer.address
-                }
-                self.__send_transaction(tx, 'punishBidder', bidder_address)
+        self.end_open_bid(auction_id)
+
+    def fetch_bids(self,
+                   auction_id: int
+                   ) -> List[Tuple[Any, ...]]:
+        """
+        Reads the bids of an auction instance from the smart contract, followed by the batched bids of its aggregator.
+        :param auction_id: ID of the auction instance.
+        :return: Bids as (address, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type), batched bids
+        being followed by their inclusion proof (root, position, proof).
+        """
+        indices = self.__bidder_indices()
+        bids = []
+        for bidder_address in self.__auctions[auction_id]['addresses']:
+            bidder = self.__call('bidders', auction_id, bidder_address)
+            bids.append((bidder_address,
+                         bidder[indices['ring']],
+                         bidder[indices['c_quantity']],
+                         bidder[indices['c_bid_value']],
+                         bidder[indices['sig']],
+                         bidder[indices['tau_1']],
+                         bidder[indices['tau_2']],
+                         bidder[indices['bidder_type']]))
 
-        # --- Getting clearing information --- #
-        logging.info('Getting uniform price.')
-        self.__auctioneer.get_uniform_price()
+        aggregator = self.__auctions[auction_id]['aggregator']
+        if aggregator is not None:
+            bids.extend(aggregator.bids())
 
-        # --- Announce clearing information --- #
-        clearingQuantity = self.__auctioneer.clearingQuantity
-        clearingPrice = self.__auctioneer.clearingPrice
-        clearingType = self.__auctioneer.clearingType
+        return bids
+
+    def announce(self,
+                 auction_id: int,
+                 result: Dict[str, Any]
+                 ) -> None:
+        """
+        Punishes the bidders whose opening failed and publishes the clearing of an auction instance. Invalid bidders are
+        collected during the opening and punished in batches of PUNISHMENT_BATCH_SIZE, one transaction per batch.
+        :param auction_id: ID of the auction instance.
+        :param result: Opening and clearing of the auction instance, as computed by the auction pool.
+        """
+        self.__auctions[auction_id]['result'] = result
+        tx = {
+            'from': self.__auctioneer.address
+        }
+        invalid = result['invalid']  # Batched bids hold no deposit of their own, see settle.
+        for start in range(0, len(invalid), Auction.PUNISHMENT_BATCH_SIZE):
+            batch = invalid[start:start + Auction.PUNISHMENT_BATCH_SIZE]
+            logging.info(f'Punishing bidders at {batch} in auction {auction_id}.')
+            self.__send_transaction(tx, 'punishBidders', auction_id, batch)
+
+        clearingQuantity, clearingPrice, clearingType = result['clearing']
+        logging.info(f'Publishing clearing price of auction {auction_id}.')
+        self.__send_transaction(tx, 'announceClearing', auction_id, clearingQuantity, clearingPrice, clearingType)
+
+    def settle(self,
+               auction_id: int,
+               result: Dict[str, Any]
+               ) -> None:
+        """
+        Records the fill of every valid bidder of an auction instance and refunds their deposits. Bidders are settled
+        in batches of SETTLEMENT_BATCH_SIZE, one transaction per batch. Fills of batched bids are left to the
+        aggregator, whose deposit is refunded less one DEPOSIT per rejected batched bid. Fills stored in an on-disk
+        order book are read chunk by chunk.
+        :param auction_id: ID of the auction instance.
+        :param result: Opening and clearing of the auction instance, as computed by the auction pool.
+        """
+        on_chain = set(self.__auctions[auction_id]['addresses'])
+        if result.get('order_book') is not None:
+            chunks = OrderBook(result['order_book'], mode='r').allocation(Auction.SETTLEMENT_BATCH_SIZE)
+        else:
+            chunks = [result['allocation']]
+
+        allocation = [(address, fill) for chunk in chunks for address, fill in zip(*chunk) if address in on_chain]
+        addresses = [address for address, _ in allocation]
+        fills = [fill for _, fill in allocation]
         tx = {
             'from': self.__auctioneer.address
         }
-        logging.info('Publishing clearing price')
-        self.__send_transaction(tx, 'announceClearing', clearingQuantity, clearingPrice, clearingType)
+        for start in range(0, len(addresses), Auction.SETTLEMENT_BATCH_SIZE):
+            end = start + Auction.SETTLEMENT_BATCH_SIZE
+            logging.info(f'Settling bidders {start} to {min(end, len(addresses))} of auction {auction_id}.')
+            self.__send_transaction(tx, 'settle', auction_id, addresses[start:end], fills[start:end])
 
-        print(self.__call('clearing'))
+        if self.__auctions[auction_id]['aggregator'] is not None:
+            logging.info(f'Forfeiting {len(result["invalid_batched"])} batched bids of auction {auction_id}.')
+            self.__send_transaction(tx, 'settleBatches', auction_id, self.__auctioneer.address,
+                                    len(result['invalid_batched']))
+
+    def release(self,
+                auction_id: int
+                ) -> None:
+        """
+        Drops the local state of a settled auction instance, e.g. in a long-lived process.
+        :param auction_id: ID of the auction instance.
+        """
+        self.__auctions.pop(auction_id, None)
+
+    def __place_batched_bids(self,
+                             auction_id: int,
+                             batch_size: int,
+                             format_version: int
+                             ) -> None:
+        """
+        Collects the sealed bids of an auction instance off chain and posts one Merkle root per batch. The auctioneer
+        acts as collector and deposits on behalf of the bidders of each batch, forfeited deposits going back to it: the
+        batched bidders themselves have no deposit at risk.
+        :param auction_id: ID of the auction instance.
+        :param batch_size: Max number of bids per batch.
+        :param format_version: Bid format, see Bidder.bid.
+        """
+        self.__auctions[auction_id]['aggregator'] = Aggregator(batch_size)
+        bidders = self.__auctions[auction_id]['bidders']
+        for start in range(0, len(bidders), batch_size):
+            bids = []
+            for bidder in bidders[start:start + batch_size]:
+                logging.info(f'Collecting bid for bidder {bidder} in auction {auction_id}.')
+                c_quantity, c_bid_value, sig = bidder.bid(format_version)
+                bids.append((bidder.address, c_quantity, c_bid_value, sig, bidder.export_ring(self.__registry),
+                             bidder.bidder_type))
+
+            for bidder, proof in zip(bidders[start:start + batch_size], self.submit_bids(auction_id, bids)):
+                bidder.inclusion_proof = proof
+
+        self.end_place_bid(auction_id)
+
+    def __pool_accounts(self,
+                        count: int
+                        ) -> List[str]:
+        """
+        Hands out accounts of the account pool, registers them for local signing and funds them.
+        :param count: Number of accounts.
+        :return: Addresses of the accounts.
+        """
+        addresses = []
+        for index in self.__account_pool.take(count):
+            addresses.append(self.__builder.add_account(self.__account_pool.private_key(index)))
+
+        self.fund_accounts(addresses, Auction.BIDDER_FUNDS)
+        return addresses
+
+    def __instance(self,
+                   auction_id: int
+                   ) -> Dict[str, Any]:
+        """
+        :return: Local state of an auction instance, created on first use.
+        """
+        return self.__auctions.setdefault(auction_id, {
+            'bidders': [],
+            'addresses': [],  # Bidders which placed their bid on chain.
+            'aggregator': None
+        })
+
+    def __bidder_indices(self) -> Dict[str, int]:
+        """
+        :return: Position of every output of the bidders getter of the smart contract, keyed by output name.
+        """
+        if self.__indices is None:
+            bidders_dic = None
+            for entry in self.__abi:
+                try:
+                    if entry['name'] == 'bidders':
+                        bidders_dic = entry
+                        break
+
+                except KeyError:
+                    pass
+
+            outputs = bidders_dic['outputs']
+            self.__indices = {}
+            for index, output in enumerate(outputs):
+                self.__indices[output['name']] = index
+
+        return self.__indices
 
     def __send_transaction(self,
                            transaction,
@@ -241,19 +700,25 @@ class Auction:
                            *args
                            ) -> None:
         """
-        Executes a transaction. Can be the execution of a smart contract function.
+        Executes a transaction. Can be the execution of a smart contract function. Function calls from accounts whose
+        private key is known are signed locally and sent raw, other transactions are signed by the node.
         :param transaction: Transaction data.
         :param participant: Optional participant whose gas consumption should be updated.
         :param func_name: Optional name of the smart contract function to be executed.
         :param args: Argument to be passed to the function.
         """
-        if func_name is not None:
+        if func_name is not None and self.__builder.has_account(transaction['from']):
+            logging.info(f'Executing function {func_name} with a locally signed transaction.')
+            tx_hash = self.__builder.send(transaction, func_name, *args)
+
+        elif func_name is not None:
             logging.info(f'Executing function {func_name}.')
             tx_hash = self.__contract.functions[func_name](*args).transact(transaction)
 
         else:
             logging.info('Executing transaction.')
             tx_hash = self.__w3.eth.sendTransaction(transaction)
+            self.__builder.forget_nonce(transaction['from'])  # Signed by the node, a local nonce would be stale.
 
         logging.info(f'Transaction hash: {tx_hash.hex()}.')
         self.__number_of_tx += 1
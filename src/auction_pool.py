@@ -0,0 +1,212 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+import os
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Tuple, Any
+from Crypto.PublicKey import RSA
+
+from src.aggregator import bid_leaf
+from src.allocation import allocate_bidders
+from src.auctioneer import Auctioneer, REJECT_INCLUSION, REJECT_RING, REJECT_DUPLICATE
+from src.helpers.utils.merkle import merkle_verify
+from src.key_registry import KeyRegistry
+from src.order_book import OrderBook
+
+
+# --- Worker state --- #
+# RSA keys cannot be pickled, every worker process therefore imports the auctioneer key once when it starts.
+_address = None
+_key = None
+_registry = KeyRegistry()  # Keys referred to by rings are imported once per worker process.
+
+
+def _init_worker(address: str,
+                 key: bytes
+                 ) -> None:
+    """
+    Initializes a worker process of the pool.
+    :param address: Address of the auctioneer.
+    :param key: PEM export of the private key of the auctioneer.
+    """
+    global _address, _key
+    _address = address
+    _key = RSA.importKey(key)
+
+
+def _ready() -> None:
+    """
+    No-op task, run by AuctionPool.warm_up once the worker process is initialized.
+    """
+
+
+def open_and_clear(auction_id: int,
+                   bids: List[Tuple[Any, ...]],
+                   roots: Optional[Dict[bytes, int]] = None,
+                   keys: Optional[Dict[int, bytes]] = None,
+                   book_dir: Optional[str] = None,
+                   auctioneer: Optional[Auctioneer] = None,
+                   registry: Optional[KeyRegistry] = None
+                   ) -> Dict[str, Any]:
+    """
+    Opens every bid of one auction instance and computes its clearing. Pure CPU work, does not touch the chain.
+    :param auction_id: ID of the auction instance.
+    :param bids: Bids as read from the smart contract:
+    (address, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type).
+    Bids collected by an aggregator also carry their inclusion proof: (..., root, position, proof).
+    A bid whose identifier or commitments were already seen is rejected, so that no bid is counted twice.
+    :param roots: Merkle roots of the batches posted on chain for the auction instance, mapped to their sizes.
+    :param keys: PEM exports of the registered keys the rings refer to, keyed by registry index.
+    :param book_dir: If set, opened bids are written to an on-disk order book in this directory and the fills are
+    stored in the book instead of being returned.
+    :param auctioneer: Auctioneer opening the bids. Defaults to a fresh auctioneer holding the worker key.
+    :param registry: Mirror of the key registry. Defaults to the mirror of the worker.
+    :return: Opened bidders, addresses of the bidders to be punished, identifiers of the rejected batched bids, whose
+    deposits are forfeited by their collector, reasons of the rejections, clearing of the auction and fill of every
+    valid bidder, or path of the order book holding them.
+    """
+    if auctioneer is None:
+        auctioneer = Auctioneer(_address, generate_new_keys=False)
+        auctioneer.import_key(_key)
+
+    book = None
+    if book_dir is not None:
+        address_size = max((len(bid[0].encode('utf-8')) for bid in bids), default=OrderBook.ADDRESS_SIZE)
+        book = OrderBook(Path(book_dir) / f'auction_{auction_id}.book', capacity=len(bids), address_size=address_size)
+        auctioneer.order_book = book
+
+    if registry is None:
+        registry = _registry
+
+    registry.update(keys or {})
+    roots = roots or {}
+    invalid = []
+    invalid_batched = []
+    seen = set()  # Identifiers and commitments of the bids processed so far.
+    for bid in bids:
+        address, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type = bid[:8]
+        rejected = invalid_batched if len(bid) > 8 else invalid
+        if address in seen or (c_quantity, c_bid_value) in seen:
+            logging.info(f'Bid of bidder at {address} is submitted more than once.')
+            if address not in seen:
+                auctioneer.rejections[address] = REJECT_DUPLICATE
+
+            rejected.append(address)
+            continue
+
+        seen.update((address, (c_quantity, c_bid_value)))
+        if len(bid) > 8:
+            root, position, proof = bid[8:]
+            leaf = bid_leaf(address, c_quantity, c_bid_value, sig, ring, bidder_type)
+            if root not in roots or not merkle_verify(leaf, position, roots[root], proof, root):
+                logging.info(f'Inclusion proof failed for bidder at {address}.')
+                auctioneer.rejections[address] = REJECT_INCLUSION
+                rejected.append(address)
+                continue
+
+        try:
+            ring = registry.resolve(ring)
+
+        except (KeyError, ValueError):
+            logging.info(f'Ring of bidder at {address} does not refer to registered keys.')
+            auctioneer.rejections[address] = REJECT_RING
+            rejected.append(address)
+            continue
+
+        logging.info(f'Opening bid for bidder at {address} in auction {auction_id}.')
+        if auctioneer.bid_opening(address, ring, c_quantity, c_bid_value, sig, tau_1, tau_2, bidder_type):
+            logging.info(f'Bid opening successful for bidder at {address}.')
+        else:
+            logging.info(f'Bid opening failed for bidder at {address}.')
+            auctioneer.bidders.pop(address, None)
+            rejected.append(address)
+
+    auctioneer.get_uniform_price()
+    if book is not None:
+        book.allocate(auctioneer.clearingQuantity)
+        book.flush()
+        allocation = None
+    else:
+        allocation = allocate_bidders(auctioneer.bidders, auctioneer.clearingQuantity)
+
+    return {
+        'auction_id': auction_id,
+        'bidders': auctioneer.bidders,
+        'invalid': invalid,
+        'invalid_batched': invalid_batched,
+        'rejections': auctioneer.rejections,
+        'clearing': (auctioneer.clearingQuantity, auctioneer.clearingPrice, auctioneer.clearingType),
+        'allocation': allocation,
+        'order_book': None if book is None else str(book.path)
+    }
+
+
+class AuctionPool:
+    """
+    This class spreads the opening and clearing of independent auction instances over a pool of processes.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 auctioneer: Auctioneer,
+                 processes: Optional[int] = None
+                 ) -> None:
+        """
+        :param auctioneer: Auctioneer whose key is used to open the bids.
+        :param processes: Number of worker processes. Defaults to the number of CPUs.
+        """
+        logging.info('Creating auction pool.')
+        self.__processes = processes or os.cpu_count() or 1
+        self.__executor = ProcessPoolExecutor(max_workers=processes,
+                                              initializer=_init_worker,
+                                              initargs=(auctioneer.address, auctioneer.export_key()))
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def run(self,
+            bids: Dict[int, List[Tuple[Any, ...]]],
+            roots: Optional[Dict[int, Dict[bytes, int]]] = None,
+            keys: Optional[Dict[int, Dict[int, bytes]]] = None,
+            book_dir: Optional[str] = None
+            ) -> Dict[int, Dict[str, Any]]:
+        """
+        Opens and clears several auction instances in parallel.
+        :param bids: Bids read from the smart contract, keyed by auction ID.
+        :param roots: Merkle roots of the batches posted on chain mapped to their sizes, keyed by auction ID.
+        :param keys: PEM exports of the registered keys the rings refer to, keyed by auction ID and registry index.
+        :param book_dir: If set, every auction instance is opened into an on-disk order book in this directory.
+        :return: Output of open_and_clear, keyed by auction ID.
+        """
+        roots = roots or {}
+        keys = keys or {}
+        futures = {auction_id: self.__executor.submit(open_and_clear, auction_id, auction_bids, roots.get(auction_id),
+                                                      keys.get(auction_id), book_dir)
+                   for auction_id, auction_bids in bids.items()}
+        return {auction_id: future.result() for auction_id, future in futures.items()}
+
+    def warm_up(self) -> None:
+        """
+        Starts the worker processes, which are otherwise started by the first run, by submitting one no-op task per
+        worker. Every worker imports the auctioneer key when it starts.
+        """
+        logging.info(f'Starting {self.__processes} worker processes.')
+        for future in [self.__executor.submit(_ready) for _ in range(self.__processes)]:
+            future.result()
+
+    def close(self) -> None:
+        """
+        Shuts the worker processes down.
+        """
+        logging.info('Closing auction pool.')
+        self.__executor.shutdown()
+
+    def __enter__(self) -> 'AuctionPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -4,32 +4,56 @@
 # ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
 
 import logging
-import struct
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from Crypto.PublicKey import RSA
 from sys import byteorder
 from collections import OrderedDict
 from src.participant import Participant
-from src.helpers.utils.crypto import decrypt, verify, parse, commit_verify
+from src.order_book import OrderBook
+from src.helpers.utils.crypto import decrypt, verify, parse, commit_verify, FORMAT_V2_TAG
+
+
+# --- Rejection reasons --- #
+REJECT_FORMAT = 'malformed bid'
+REJECT_COMMITMENT = 'cipher text does not match its commitment'
+REJECT_SIGNATURE = 'invalid ring signature'
+REJECT_DECRYPTION = 'cipher text cannot be decrypted'
+REJECT_PLAINTEXT = 'plain text does not match the commitments and signature'
+REJECT_OPENING = 'quantity or bid value does not match its commitment'
+REJECT_INCLUSION = 'bid is not included in a posted batch'
+REJECT_RING = 'ring refers to unregistered keys'
+REJECT_RANGE = 'quantity or bid value out of range'
+REJECT_DUPLICATE = 'bid is submitted more than once'
+
 
 class Auctioneer(Participant):
     """
     This class handles the auctioneer.
     """
 
+    # --- Constants --- #
+    DIGEST = int(256 / 8)  # Size of commitments and their randomness.
+    RSA_BLOCK = int(2048 / 8)  # Size of a cipher text block and of every element of a ring signature.
+    MAX_VALUE = 2 ** 31 - 1  # Largest opened quantity or bid value, so that sums over the book fit 64 bit columns.
+
     # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
 
     def __init__(self,
                  address: str,
-                 generate_new_keys: Optional[bool] = True
+                 generate_new_keys: Optional[bool] = True,
+                 order_book: Optional[OrderBook] = None
                  ) -> None:
         """
         :param address: Address of the auctioneer.
         :param generate_new_keys: Flag indicating whether new RSA keys need to be generated.
+        :param order_book: If set, opened bids are written to this on-disk order book instead of bidders and the
+        clearing runs over the book.
         """
         logging.info('Creating auctioneer.')
         super().__init__(address, generate_new_keys)
+        self.order_book = order_book
         self.bidders = {}
+        self.rejections = {}  # Bidder address -> reason of the rejection of its bid.
         self.clearingQuantity = 0
         self.clearingPrice = 0
         self.clearingType = 0
@@ -47,7 +71,12 @@ class Auctioneer(Participant):
                     bidder_type: int,
                     ) -> bool:
         """
-        Opens the bid value for bidder at address and stores it.
+        Opens the bid value for bidder at address and stores it. Both signature formats are accepted, version 2 bids
+        being recognised by the first field of their signature.
+        Checks run from the cheapest to the most expensive (format and lengths, commitment hashes, ring signatures,
+        decryption) so that a junk bid is rejected before the costly RSA decryption. Opened quantities of 0, which
+        get_uniform_price would count as price levels, and quantities or bid values above MAX_VALUE are rejected as
+        well. The reason of every rejection is recorded in rejections.
         :param bidder_type:
         :param bid_value:
         :param address: Address of the bidder.
@@ -58,43 +87,126 @@ class Auctioneer(Participant):
         :return: Whether the bid opening was successful.
         """
         logging.info(f'Opening bid for bidder at {address}.')
-        status = False
         # initialise bidder
+        if self.order_book is None:
+            self.bidders[address] = {
+                'quantity': 0,
+                'bid_value': 0,
+                'bidder_type': -1,
+                'status': False
+            }
+
+        reason, quantity, bid_value = self.__open(ring, c_quantity, c_bid_value, sig, tau_1, tau_2)
+        if reason is not None:
+            logging.info(f'Bid opening failed for bidder at {address}: {reason}.')
+            self.rejections[address] = reason
+            return False
+
+        logging.info('Storing bid, bid value and validating opening.')
+        if self.order_book is not None:
+            self.order_book.append(address, int.from_bytes(quantity, byteorder), int.from_bytes(bid_value, byteorder),
+                                   bidder_type)
+            return True
+
         self.bidders[address] = {
-            'quantity': 0,
-            'bid_value': 0,
-            'bidder_type': -1,
-            'status': status
+            'quantity': int.from_bytes(quantity, byteorder),
+            'bid_value': int.from_bytes(bid_value, byteorder),
+            'bidder_type': bidder_type,
+            'status': True
         }
+        return True
+
+    def __open(self,
+               ring: List[RSA.RsaKey],
+               c_quantity: bytes,
+               c_bid_value: bytes,
+               sig: bytes,
+               tau_1: bytes,
+               tau_2: bytes
+               ) -> Tuple[Optional[str], Optional[bytes], Optional[bytes]]:
+        """
+        Validation pipeline of bid_opening.
+        :return: Reason of the rejection, None if the bid is valid, followed by the opened quantity and bid value.
+        """
+        rejected = (None, None)
+        # --- Format and lengths --- #
         logging.info('Parsing sigma.')
-        sigma_quantity, sigma_bid_value, c1_quantity, c1_bid_value = parse(sig)
-        if self.verify(c_quantity, sigma_quantity, ring) and self.verify(c_bid_value, sigma_bid_value, ring):
-            logging.info('Signature sigma successfully verified.')
-            C_quantity, d1_quantity = parse(tau_1)
-            C_bid_value, d1_bid_value = parse(tau_2)
-            if commit_verify(C_quantity, d1_quantity, c1_quantity) and commit_verify(C_bid_value, d1_bid_value, c1_bid_value):
-                logging.info('Commitment C successfully verified.')
-                m1 = self.decrypt(C_quantity)
-                m2 = self.decrypt(C_bid_value)
-                logging.info('Cipher text C decrypted.')
-                logging.info('Parsing m1.')
-                c_quantity_tilde, sigma_quantity_tilde, quantity, d_quantity = parse(m1)
-                c_bid_value_tilde, sigma_bid_value_tilde, bid_value, d_bid_value = parse(m2)
-                if (c_quantity_tilde == c_quantity and sigma_quantity_tilde == sigma_quantity) and (c_bid_value_tilde == c_bid_value and sigma_bid_value_tilde == sigma_bid_value):
-                    if commit_verify(quantity, d_quantity, c_quantity) and commit_verify(bid_value, d_bid_value, c_bid_value):
-                        logging.info('Commitment to quantity and bid value successfully verified.')
-                        logging.info('Storing bid, bid value and validating opening.')
-                        self.bidders[address] = {
-                            'quantity': int.from_bytes(quantity, byteorder),
-                            'bid_value': int.from_bytes(bid_value, byteorder),
-                            'bidder_type': bidder_type,
-                            'status': True
-                        }
-                        # print(f'Quantity: {int.from_bytes(quantity, byteorder)}.')
-                        # print(f'Bid Value: {int.from_bytes(bid_value, byteorder)}.')
-                        status = True
-
-        return status
+        fields = parse(sig)
+        if fields[0] == FORMAT_V2_TAG:
+            if len(fields) != 3:
+                return (REJECT_FORMAT, *rejected)
+
+            _, sigma, c1 = fields
+            signed = [(c_quantity + c_bid_value, sigma)]
+            tokens = [(tau_1, c1)]
+
+        else:
+            if len(fields) != 4:
+                return (REJECT_FORMAT, *rejected)
+
+            sigma_quantity, sigma_bid_value, c1_quantity, c1_bid_value = fields
+            signed = [(c_quantity, sigma_quantity), (c_bid_value, sigma_bid_value)]
+            tokens = [(tau_1, c1_quantity), (tau_2, c1_bid_value)]
+
+        openings = list(map(lambda token: parse(token[0]), tokens))
+        sig_size = Auctioneer.RSA_BLOCK * (len(ring) + 1)
+        if not ring \
+                or len(c_quantity) != Auctioneer.DIGEST or len(c_bid_value) != Auctioneer.DIGEST \
+                or any(len(sigma) != sig_size for _, sigma in signed) \
+                or any(len(c1) != Auctioneer.DIGEST for _, c1 in tokens) \
+                or any(len(opening) != 2 for opening in openings) \
+                or any(len(C) == 0 or len(C) % Auctioneer.RSA_BLOCK or len(d1) != Auctioneer.DIGEST
+                       for C, d1 in openings):
+            return (REJECT_FORMAT, *rejected)
+
+        # --- Commitments to the cipher texts --- #
+        if not all(commit_verify(C, d1, c1) for (C, d1), (_, c1) in zip(openings, tokens)):
+            return (REJECT_COMMITMENT, *rejected)
+
+        logging.info('Commitment C successfully verified.')
+        # --- Ring signatures --- #
+        if not all(self.verify(msg, sigma, ring) for msg, sigma in signed):
+            return (REJECT_SIGNATURE, *rejected)
+
+        logging.info('Signature sigma successfully verified.')
+        # --- Decryption --- #
+        try:
+            plains = list(map(lambda opening: parse(self.decrypt(opening[0])), openings))
+
+        except ValueError:
+            return (REJECT_DECRYPTION, *rejected)
+
+        logging.info('Cipher text C decrypted.')
+        if len(signed) == 1:
+            if len(plains[0]) != 7:
+                return (REJECT_PLAINTEXT, *rejected)
+
+            c_quantity_tilde, c_bid_value_tilde, sigma_tilde, quantity, d_quantity, bid_value, d_bid_value = plains[0]
+            consistent = c_quantity_tilde == c_quantity and c_bid_value_tilde == c_bid_value and sigma_tilde == sigma
+
+        else:
+            if len(plains[0]) != 4 or len(plains[1]) != 4:
+                return (REJECT_PLAINTEXT, *rejected)
+
+            c_quantity_tilde, sigma_quantity_tilde, quantity, d_quantity = plains[0]
+            c_bid_value_tilde, sigma_bid_value_tilde, bid_value, d_bid_value = plains[1]
+            consistent = (c_quantity_tilde == c_quantity and sigma_quantity_tilde == sigma_quantity) \
+                and (c_bid_value_tilde == c_bid_value and sigma_bid_value_tilde == sigma_bid_value)
+
+        if not consistent:
+            return (REJECT_PLAINTEXT, *rejected)
+
+        # --- Commitments to quantity and bid value --- #
+        if not (commit_verify(quantity, d_quantity, c_quantity) and commit_verify(bid_value, d_bid_value, c_bid_value)):
+            return (REJECT_OPENING, *rejected)
+
+        logging.info('Commitment to quantity and bid value successfully verified.')
+        # --- Ranges --- #
+        if not 0 < int.from_bytes(quantity, byteorder) <= Auctioneer.MAX_VALUE \
+                or int.from_bytes(bid_value, byteorder) > Auctioneer.MAX_VALUE:
+            return (REJECT_RANGE, *rejected)
+
+        return None, quantity, bid_value
 
     def getAvg(self, a, b):
         return (a + b) / 2
@@ -104,6 +216,13 @@ class Auctioneer(Participant):
         Gets the winning bid value and the winning commitment.
         """
         logging.info('Getting uniform price.')
+        if self.order_book is not None:
+            self.clearingQuantity, self.clearingPrice, self.clearingType = self.order_book.clear()
+            print("clearing price: ", self.clearingPrice)
+            print("clearing quantity: ", self.clearingQuantity)
+            print("clearing type: ", self.clearingType)
+            return
+
         demand_quantity = 0
         supply_quantity = 0
 
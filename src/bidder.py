@@ -4,14 +4,16 @@
 # ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
 
 import logging
-import struct
 from typing import Optional, List, Tuple
 from random import randint, sample, shuffle
 from Crypto.PublicKey import RSA
 from sys import byteorder
 
 from src.participant import Participant
-from src.helpers.utils.crypto import sign, commit, encrypt, concatenate
+from src.auctioneer import Auctioneer
+from src.helpers.utils.crypto import sign, commit, encrypt, concatenate, FORMAT_V1, FORMAT_V2, FORMAT_V2_TAG
+from src.helpers.utils.randomness import RandomnessProvider
+from src.key_registry import KeyRegistry, pack_ring
 
 __author__ = 'Denis Verstraeten'
 __date__ = '2020.3.6'
@@ -60,45 +62,71 @@ class Bidder(Participant):
         self.sig = None
         self.tau_1 = None
         self.tau_2 = None
+        self.inclusion_proof = None  # (root, position, siblings) when the bid is batched by an aggregator
         logging.info('Bidder created.')
 
     # --------------------------------------------------- METHODS --------------------------------------------------- #
 
-    def make_ring(self, keys: List[RSA.RsaKey]) -> None:
+    def make_ring(self, keys: List[RSA.RsaKey], size: Optional[int] = None) -> None:
         """
-        Builds a ring of possible signers.
+        Builds a ring of possible signers. Only size keys are drawn, the keys of the bidder and of the auctioneer being
+        recognised by their modulus, so that building the rings of many bidders stays linear.
         :param keys: Keys from which the ring is constructed.
+        :param size: Number of keys in the ring, at least 2. Defaults to a random size.
         """
         logging.info('Making ring for bidder.')
-        self.ring = [self.public_key, self.auctioneer_pub_key]
-        self.ring.extend(sample(list(filter(
-            lambda key: key != self.public_key and key != self.auctioneer_pub_key, keys)), randint(0, len(keys) - 2)))
+        count = randint(0, max(len(keys) - 2, 0)) if size is None else size - 2
+        if count < 0:
+            raise ValueError(f'A ring holds at least 2 keys, not {size}.')
+
+        excluded = {self.public_key.n, self.auctioneer_pub_key.n}
+        drawn = map(keys.__getitem__, sample(range(len(keys)), min(count + 2, len(keys))))
+        others = [key for key in drawn if key.n not in excluded][:count]
+        if len(others) < count:
+            raise ValueError(f'Cannot build a ring of {size} keys from {len(keys)} keys.')
+
+        self.ring = [self.public_key, self.auctioneer_pub_key] + others
         shuffle(self.ring)
         self.__s = self.ring.index(self.public_key)
         self.ring[self.__s] = self._RSA_key
         logging.info(f'Ring of size {len(self.ring)} created. s = {self.__s}.')
         logging.debug(f'Ring: {self.ring}.')
 
-    def export_ring(self) -> bytes:
+    def export_ring(self, registry: KeyRegistry) -> bytes:
         """
-        :return: The concatenation of the keys of the ring.
+        :param registry: Mirror of the public key registry in which every key of the ring is registered.
+        :return: The registry indices of the keys of the ring, packed.
         """
-        return concatenate(*list(map(lambda key: key.publickey().exportKey(), self.ring)))
+        return pack_ring(map(registry.index_of, self.ring))
 
-    def bid(self) -> Tuple[bytes, bytes, bytes]:
+    def bid(self,
+            format_version: Optional[int] = FORMAT_V1,
+            rng: Optional[RandomnessProvider] = None
+            ) -> Tuple[bytes, bytes, bytes]:
         """
+        :param format_version: FORMAT_V1 signs and encrypts quantity and bid value separately, FORMAT_V2 signs and
+        encrypts both commitments at once, which halves the RSA work and the signature size.
+        :param rng: Source of the commitment and signature randomness. Defaults to the shared OS randomness provider.
         :return: Commitments and signatures to the bid to be placed.
         """
+        # Out of range bids are rejected at opening and their deposit forfeited, they are not sealed at all.
+        if not (0 < self.quantity <= Auctioneer.MAX_VALUE and 0 <= self.bid_value <= Auctioneer.MAX_VALUE):
+            raise ValueError(f'Quantity {self.quantity} must lie between 1 and {Auctioneer.MAX_VALUE} and bid value '
+                             f'{self.bid_value} between 0 and {Auctioneer.MAX_VALUE}.')
+
+        if format_version == FORMAT_V2:
+            return self.__bid_v2(rng)
+
         logging.info('Generating bid.')
         logging.info('Computing c and d for quantity and bid value.')
         # Generate commitment for quantity factor
-        self.c_quantity, self.d_quantity = commit(self.quantity.to_bytes(int(256 / 8), byteorder))
+        self.c_quantity, self.d_quantity = commit(self.quantity.to_bytes(int(256 / 8), byteorder), rng)
         # Generate commitment for bid value
-        self.c_bidValue, self.d_bidValue = commit(self.bid_value.to_bytes(int(256 / 8), byteorder))
+        self.c_bidValue, self.d_bidValue = commit(self.bid_value.to_bytes(int(256 / 8), byteorder), rng)
         logging.info('Computing sigma for quantity.')
-        self.sigma_quantity = sign(self.ring, self.__s, self.c_quantity)  # __s stands for bidder's secret key
+        self.sigma_quantity = sign(self.ring, self.__s, self.c_quantity, rng)  # __s stands for bidder's secret key
         logging.info('Computing sigma for bid value.')
-        self.sigma_bidValue = sign(self.ring, self.__s, self.c_bidValue)
+        self.sigma_bidValue = sign(self.ring, self.__s, self.c_bidValue, rng)
         logging.info('Computing C1.')
         # msg = c_quantity || sigma || quantity || d_quantity
         quantity_msg = concatenate(self.c_quantity, self.sigma_quantity, self.quantity.to_bytes(int(256 / 8), byteorder), self.d_quantity)
@@ -108,8 +136,8 @@ class Bidder(Participant):
         self.C_quantity = encrypt(quantity_msg, self.auctioneer_pub_key)
         self.C_bidValue = encrypt(bid_value_msg, self.auctioneer_pub_key)
         logging.info('Computing commitments for encrypted C.')
-        self.c1_quantity, self.d1_quantity = commit(self.C_quantity)
-        self.c1_bidValue, self.d1_bidValue = commit(self.C_bidValue)
+        self.c1_quantity, self.d1_quantity = commit(self.C_quantity, rng)
+        self.c1_bidValue, self.d1_bidValue = commit(self.C_bidValue, rng)
         # modified signature equals σ_quantity | σ_bidValue | c1_quantity | c1_bidValue
         self.sig = concatenate(self.sigma_quantity, self.sigma_bidValue, self.c1_quantity, self.c1_bidValue)
         self.tau_1 = concatenate(self.C_quantity, self.d1_quantity)  # opening token for quantity
@@ -117,6 +145,35 @@ class Bidder(Participant):
 
         return self.c_quantity, self.c_bidValue, self.sig
 
+    def __bid_v2(self,
+                 rng: Optional[RandomnessProvider] = None
+                 ) -> Tuple[bytes, bytes, bytes]:
+        """
+        :param rng: Source of the commitment and signature randomness.
+        :return: Commitments and signature to the bid to be placed, one ring signature covering both commitments.
+        """
+        logging.info('Generating version 2 bid.')
+        quantity = self.quantity.to_bytes(int(256 / 8), byteorder)
+        bid_value = self.bid_value.to_bytes(int(256 / 8), byteorder)
+        self.c_quantity, self.d_quantity = commit(quantity, rng)
+        self.c_bidValue, self.d_bidValue = commit(bid_value, rng)
+        logging.info('Computing sigma for quantity and bid value.')
+        self.sigma_quantity = self.sigma_bidValue = sign(self.ring, self.__s, self.c_quantity + self.c_bidValue, rng)
+        logging.info('Computing C1.')
+        # msg = c_quantity || c_bidValue || sigma || quantity || d_quantity || bid_value || d_bidValue
+        msg = concatenate(self.c_quantity, self.c_bidValue, self.sigma_quantity, quantity, self.d_quantity, bid_value,
+                          self.d_bidValue)
+        self.C_quantity = self.C_bidValue = encrypt(msg, self.auctioneer_pub_key)
+        logging.info('Computing commitment for encrypted C.')
+        self.c1_quantity, self.d1_quantity = commit(self.C_quantity, rng)
+        self.c1_bidValue, self.d1_bidValue = self.c1_quantity, self.d1_quantity
+        # signature equals v2 | σ | c1
+        self.sig = concatenate(FORMAT_V2_TAG, self.sigma_quantity, self.c1_quantity)
+        self.tau_1 = concatenate(self.C_quantity, self.d1_quantity)  # opening token for quantity and bid value
+        self.tau_2 = b''
+
+        return self.c_quantity, self.c_bidValue, self.sig
+
     def __repr__(self) -> str:
         """
         :return: str representation of Bidder.
@@ -0,0 +1,233 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import asyncio
+import json
+import logging
+import os
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from time import perf_counter, time
+from typing import Optional, List, Dict, Any
+
+from src.auction import Auction
+from src.auction_pool import AuctionPool
+from src.helpers.utils.crypto import FORMAT_V1
+
+
+# --- Constants --- #
+BIDDER_OPTIONS = ('bidder_file', 'bidders_number', 'ring_size')  # Options of Auction.create_bidders.
+
+class AuctioneerDaemon:
+    """
+    This class handles a resident auctioneer which stays warm across trading intervals. The smart contract is
+    compiled and deployed, the auctioneer key is loaded, the bidders are created and their keys registered, the ABI
+    metadata and the key registry mirror are decoded and the worker processes are started once; every interval then
+    only costs the auction work itself.
+    Commands are text lines over a local TCP socket, every command being answered with one JSON line:
+    - "run interval N" runs the auction instances of trading interval N,
+    - "status" reports the intervals run so far,
+    - "shutdown" stops the daemon.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 auction: Auction,
+                 key_file: Optional[Path] = None,
+                 zones: Optional[int] = 1,
+                 processes: Optional[int] = None,
+                 options: Optional[Dict[str, Any]] = None
+                 ) -> None:
+        """
+        :param auction: Auction whose connection, contract handle and caches are kept warm.
+        :param key_file: PEM file of the auctioneer key. Created on first start, so that the key survives restarts.
+        :param zones: Number of auction instances per trading interval, e.g. one per grid zone.
+        :param processes: Number of worker processes opening and clearing the auctions. Defaults to the number of CPUs.
+        :param options: Further keyword arguments of Auction.create_bidders (bidder_file, bidders_number, ring_size),
+        used once per zone at warm up, and of Auction.run_auctions, e.g. batch_size or format_version.
+        """
+        logging.info('Creating auctioneer daemon.')
+        self.zones = zones
+        self.__auction = auction
+        self.__key_file = key_file
+        self.__processes = processes
+        options = dict(options or {})
+        self.__bidder_options = {name: options.pop(name) for name in BIDDER_OPTIONS if name in options}
+        self.__options = options
+        self.__bidders = []  # Bidders of every zone, reused in every interval.
+        self.__pool = None
+        self.__server = None
+        self.__stopped = None
+        self.__executor = ThreadPoolExecutor(max_workers=1)  # Intervals run one at a time.
+        self.__started = None
+        self.intervals = {}  # Trading interval -> duration of its run in seconds.
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def warm_up(self) -> None:
+        """
+        Deploys the smart contract, loads or creates the auctioneer key, creates the bidders of every zone and starts
+        the worker processes. A new key file is only readable by its owner.
+        """
+        start = perf_counter()
+        key = None
+        if self.__key_file is not None and self.__key_file.exists():
+            logging.info(f'Loading auctioneer key from {self.__key_file}.')
+            key = self.__key_file.read_bytes()
+
+        auctioneer = self.__auction.setup(key)
+        if self.__key_file is not None and key is None:
+            descriptor = os.open(self.__key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(descriptor, 'wb') as key_file:
+                key_file.write(auctioneer.export_key())
+
+        self.__bidders = [self.__auction.create_bidders(None, **self.__bidder_options) for _ in range(self.zones)]
+        self.__pool = AuctionPool(auctioneer, self.__processes)
+        self.__pool.warm_up()
+        logging.info(f'Auctioneer daemon warmed up in {perf_counter() - start:.2f} s.')
+
+    def run_interval(self,
+                     interval: int
+                     ) -> Dict[str, Any]:
+        """
+        Runs the auction instances of one trading interval, auction IDs interval * zones to (interval + 1) * zones - 1,
+        with the bidders created at warm up.
+        :param interval: Trading interval.
+        :return: Clearing of every auction instance and duration of the run.
+        """
+        if interval in self.intervals:
+            raise ValueError(f'Interval {interval} has already been run')
+
+        start = perf_counter()
+        auction_ids = list(range(interval * self.zones, (interval + 1) * self.zones))
+        results = self.__auction.run_auctions(dict(zip(auction_ids, self.__bidders)), pool=self.__pool,
+                                              **self.__options)
+        for auction_id in auction_ids:
+            self.__auction.release(auction_id)
+
+        self.intervals[interval] = perf_counter() - start
+        return {
+            'interval': interval,
+            'clearing': {auction_id: results[auction_id]['clearing'] for auction_id in auction_ids},
+            'invalid': {auction_id: results[auction_id]['invalid'] + results[auction_id]['invalid_batched']
+                        for auction_id in auction_ids},
+            'seconds': self.intervals[interval]
+        }
+
+    async def serve(self,
+                    host: Optional[str] = '127.0.0.1',
+                    port: Optional[int] = 8765
+                    ) -> None:
+        """
+        Warms up and serves commands until shutdown.
+        :param host: Interface to listen on, local only by default.
+        :param port: Port to listen on.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.__executor, self.warm_up)
+        self.__started = time()
+        self.__stopped = asyncio.Event()
+        self.__server = await asyncio.start_server(self.__handle, host, port)
+        print(f'Auctioneer daemon listening on {host}:{port}.')
+        await self.__stopped.wait()
+        self.__server.close()
+        await self.__server.wait_closed()
+        self.__pool.close()
+        self.__executor.shutdown()
+
+    async def __handle(self,
+                       reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter
+                       ) -> None:
+        """
+        Serves the commands of one client, one at a time.
+        """
+        try:
+            while line := await reader.readline():
+                response = await self.__command(line.decode('utf-8').split())
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        except (ConnectionError, UnicodeDecodeError) as e:
+            logging.info(f'Closing daemon connection: {e}.')
+
+        finally:
+            writer.close()
+
+    async def __command(self,
+                        words: List[str]
+                        ) -> Dict[str, Any]:
+        """
+        :return: Response to one command.
+        """
+        if len(words) == 3 and words[:2] == ['run', 'interval'] and words[2].isdigit():
+            logging.info(f'Running trading interval {words[2]}.')
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self.__executor, self.run_interval,
+                                                                          int(words[2]))
+
+            except Exception as e:
+                logging.error(f'Trading interval {words[2]} failed: {e}.')
+                return {'status': 'failed', 'reason': str(e)}
+
+            return {'status': 'done', **result}
+
+        if words == ['status']:
+            return {'status': 'running', 'uptime': time() - self.__started, 'intervals': self.intervals}
+
+        if words == ['shutdown']:
+            self.__stopped.set()
+            return {'status': 'stopping'}
+
+        return {'status': 'rejected', 'reason': 'expected "run interval N", "status" or "shutdown"'}
+
+
+async def send_command(command: str,
+                       host: Optional[str] = '127.0.0.1',
+                       port: Optional[int] = 8765
+                       ) -> Dict[str, Any]:
+    """
+    Sends one command to a running daemon.
+    :return: Response of the daemon.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(command.encode('utf-8') + b'\n')
+    await writer.drain()
+    response = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return response
+
+
+def main() -> None:
+    parser = ArgumentParser(description='Resident auctioneer daemon.')
+    parser.add_argument('--port', type=int, default=8765, help='Local port of the daemon.')
+    parser.add_argument('--send', type=str, default=None,
+                        help='Send a command, e.g. "run interval 3", to a running daemon instead of starting one.')
+    parser.add_argument('--key-file', type=str, default='auctioneer.pem', help='PEM file of the auctioneer key.')
+    parser.add_argument('--zones', type=int, default=1, help='Auction instances per trading interval.')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='Number of processes opening and clearing the auctions (default: number of CPUs).')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Collect bids off chain and post one Merkle root per batch of this many bids.')
+    parser.add_argument('--format-version', type=int, default=FORMAT_V1, choices=[1, 2], help='Bid format.')
+    parser.add_argument('--bidders-file', type=str, default='bidders.json', help='Bidder data file.')
+    parser.add_argument('--ring-size', type=int, default=None, help='Number of keys in every ring (default: random).')
+    args = parser.parse_args()
+
+    if args.send is not None:
+        print(json.dumps(asyncio.run(send_command(args.send, port=args.port)), indent=4))
+        return
+
+    daemon = AuctioneerDaemon(Auction(), Path(args.key_file), args.zones, args.processes,
+                              {'batch_size': args.batch_size, 'format_version': args.format_version,
+                               'bidder_file': Path(args.bidders_file), 'ring_size': args.ring_size})
+    asyncio.run(daemon.serve(port=args.port))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,345 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Tuple, Callable, Any
+
+from src.auctioneer import Auctioneer, REJECT_FORMAT
+from src.helpers.utils.crypto import parse, FORMAT_V2_TAG
+from src.key_registry import unpack_ring
+
+
+# --- Constants --- #
+BID_FIELDS = ('identifier', 'c_quantity', 'c_bid_value', 'sig', 'ring')  # Hex encoded except the identifier.
+OPEN_FIELDS = ('root', 'tau_1', 'tau_2')  # Hex encoded.
+MAX_LINE = 1 << 20  # Max size of a request line in bytes.
+
+
+def check_bid(c_quantity: bytes,
+              c_bid_value: bytes,
+              sig: bytes,
+              ring: bytes,
+              bidder_type: int
+              ) -> Optional[str]:
+    """
+    Checks the format of a sealed bid, without any cryptographic work. See Auctioneer.bid_opening.
+    :return: Reason of the rejection, None if the format is valid.
+    """
+    try:
+        ring_size = len(unpack_ring(ring))
+
+    except ValueError:
+        return REJECT_FORMAT
+
+    fields = parse(sig)
+    version_2 = fields[0] == FORMAT_V2_TAG
+    sigmas = fields[1:2] if version_2 else fields[:2]
+    if ring_size == 0 or len(fields) != (3 if version_2 else 4) \
+            or len(c_quantity) != Auctioneer.DIGEST or len(c_bid_value) != Auctioneer.DIGEST \
+            or any(len(sigma) != Auctioneer.RSA_BLOCK * (ring_size + 1) for sigma in sigmas) \
+            or any(len(c1) != Auctioneer.DIGEST for c1 in fields[2:]) \
+            or bidder_type not in (0, 1):
+        return REJECT_FORMAT
+
+    return None
+
+
+def check_opening(tau_1: bytes,
+                  tau_2: bytes
+                  ) -> Optional[str]:
+    """
+    Checks the format of the opening tokens of a sealed bid, version 2 bids having an empty tau_2.
+    :return: Reason of the rejection, None if the format is valid.
+    """
+    for tau in (tau_1, tau_2) if tau_2 else (tau_1,):
+        opening = parse(tau)
+        if len(opening) != 2 or len(opening[0]) == 0 or len(opening[0]) % Auctioneer.RSA_BLOCK \
+                or len(opening[1]) != Auctioneer.DIGEST:
+            return 'malformed opening'
+
+    return None
+
+
+class BidGateway:
+    """
+    This class handles an asyncio intake service for sealed bids of participants which hold no Ethereum account.
+    Requests are newline delimited JSON objects over a local TCP socket, binary fields being hex encoded:
+    - {"type": "key", "pem"} registers a public key and is answered with its registry index,
+    - {"type": "bid", "auction_id", "identifier", "c_quantity", "c_bid_value", "sig", "ring", "bidder_type"} is
+    answered with the inclusion proof of the bid once its batch is posted on chain,
+    - {"type": "open", "auction_id", "root", "position", "tau_1", "tau_2"} hands the opening tokens over. Tokens must
+    open the commitments of the bid and a bid can only be opened once.
+    Identifiers are unique per auction instance, a second bid under the same identifier is rejected.
+    Bids wait in a bounded queue: when it is full, the gateway stops reading from the clients until the submission
+    path catches up. Queued bids are submitted in batches of up to batch_size bids per auction instance.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 submit: Callable[[int, List[Tuple[Any, ...]]], List[Tuple[bytes, int, List[bytes]]]],
+                 open_bid: Callable[[int, bytes, int, bytes, bytes], None],
+                 register_key: Callable[[bytes], int],
+                 batch_size: Optional[int] = 256,
+                 max_pending: Optional[int] = 4096,
+                 batch_timeout: Optional[float] = 1.0
+                 ) -> None:
+        """
+        :param submit: Chain submission path, e.g. Auction.submit_bids. Called with an auction ID and bids
+        (identifier, c_quantity, c_bid_value, sig, ring, bidder_type), returns their inclusion proofs
+        (root, position, siblings).
+        :param open_bid: Receiver of opening tokens, e.g. Auction.open_batched_bid.
+        :param register_key: Registers a PEM exported public key and returns its registry index, e.g.
+        Auction.register_key.
+        :param batch_size: Max number of bids per submission.
+        :param max_pending: Max number of bids waiting for submission.
+        :param batch_timeout: Max time in seconds a bid waits for its batch to fill up.
+        """
+        logging.info('Creating bid gateway.')
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.__submit = submit
+        self.__open_bid = open_bid
+        self.__register_key = register_key
+        self.__executor = ThreadPoolExecutor(max_workers=1)
+        self.__queue = asyncio.Queue(maxsize=max_pending)
+        self.__identifiers = {}  # Auction ID -> identifiers of the bids accepted for submission.
+        self.__server = None
+        self.__consumer = None
+        self.submitted = 0
+        self.rejected = 0
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    async def start(self,
+                    host: Optional[str] = '127.0.0.1',
+                    port: Optional[int] = 0
+                    ) -> Tuple[str, int]:
+        """
+        Starts listening and submitting.
+        :param host: Interface to listen on, local only by default.
+        :param port: Port to listen on, 0 picks a free port.
+        :return: Address the gateway listens on.
+        """
+        self.__server = await asyncio.start_server(self.__handle, host, port, limit=MAX_LINE)
+        self.__consumer = asyncio.create_task(self.__consume())
+        address = self.__server.sockets[0].getsockname()[:2]
+        logging.info(f'Bid gateway listening on {address[0]}:{address[1]}.')
+        return address
+
+    async def stop(self) -> None:
+        """
+        Stops accepting connections, submits the queued bids and stops.
+        """
+        logging.info('Stopping bid gateway.')
+        self.__server.close()
+        await self.__server.wait_closed()
+        await self.__queue.join()
+        self.__consumer.cancel()
+        self.__executor.shutdown()
+
+    async def __handle(self,
+                       reader: asyncio.StreamReader,
+                       writer: asyncio.StreamWriter
+                       ) -> None:
+        """
+        Serves the requests of one client, one at a time.
+        """
+        try:
+            while line := await reader.readline():
+                response = await self.__request(line)
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logging.info(f'Closing gateway connection: {e}.')
+
+        finally:
+            writer.close()
+
+    async def __request(self,
+                        line: bytes
+                        ) -> Dict[str, Any]:
+        """
+        :return: Response to one request.
+        """
+        try:
+            request = json.loads(line)
+            if request['type'] == 'key':
+                index = await self.__run(self.__register_key, bytes.fromhex(request['pem']))
+                return {'status': 'registered', 'index': index}
+
+            auction_id = int(request['auction_id'])
+            if request['type'] == 'bid':
+                payload = (bytes.fromhex(request[field]) for field in BID_FIELDS[1:])
+                bid = (str(request['identifier']), *payload, int(request['bidder_type']))
+                reason = check_bid(*bid[1:])
+                if reason is None and bid[0] in self.__identifiers.setdefault(auction_id, set()):
+                    reason = f'duplicate identifier {bid[0]}'
+
+            elif request['type'] == 'open':
+                root, tau_1, tau_2 = (bytes.fromhex(request[field]) for field in OPEN_FIELDS)
+                position = int(request['position'])
+                reason = check_opening(tau_1, tau_2)
+
+            else:
+                reason = f'unknown request type {request["type"]}'
+
+        except (KeyError, TypeError, ValueError) as e:
+            reason = f'malformed request: {e}'
+
+        if reason is not None:
+            self.rejected += 1
+            return {'status': 'rejected', 'reason': reason}
+
+        if request['type'] == 'open':
+            try:
+                await self.__run(self.__open_bid, auction_id, root, position, tau_1, tau_2)
+
+            except (KeyError, IndexError):
+                self.rejected += 1
+                return {'status': 'rejected', 'reason': 'unknown bid'}
+
+            except ValueError as e:
+                self.rejected += 1
+                return {'status': 'rejected', 'reason': str(e)}
+
+            return {'status': 'opened'}
+
+        self.__identifiers[auction_id].add(bid[0])
+        proof = asyncio.get_running_loop().create_future()
+        await self.__queue.put((auction_id, bid, proof))  # Waits while the queue is full.
+        try:
+            root, position, siblings = await proof
+
+        except Exception as e:
+            return {'status': 'failed', 'reason': str(e)}
+
+        return {'status': 'accepted', 'root': root.hex(), 'position': position,
+                'proof': [sibling.hex() for sibling in siblings]}
+
+    async def __run(self,
+                    func: Callable[..., Any],
+                    *args
+                    ) -> Any:
+        """
+        Runs a blocking call of the chain facing side. Calls run one at a time, in a dedicated thread, so that nonces
+        and aggregator state are never shared between threads.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.__executor, func, *args)
+
+    async def __consume(self) -> None:
+        """
+        Drains the queue in batches and hands every batch over to the submission path.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.__queue.get()]
+            deadline = loop.time() + self.batch_timeout
+            while len(pending) < self.batch_size:
+                try:
+                    pending.append(await asyncio.wait_for(self.__queue.get(), deadline - loop.time()))
+
+                except asyncio.TimeoutError:
+                    break
+
+            batches = {}
+            for auction_id, bid, proof in pending:
+                batches.setdefault(auction_id, []).append((bid, proof))
+
+            for auction_id, batch in batches.items():
+                logging.info(f'Submitting {len(batch)} bids for auction {auction_id}.')
+                try:
+                    proofs = await self.__run(self.__submit, auction_id, [bid for bid, _ in batch])
+                    for (_, future), proof in zip(batch, proofs):
+                        if not future.done():  # The client may have left.
+                            future.set_result(proof)
+
+                    self.submitted += len(batch)
+
+                except Exception as e:
+                    logging.error(f'Submission of {len(batch)} bids for auction {auction_id} failed: {e}.')
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+
+            for _ in pending:
+                self.__queue.task_done()
+
+
+async def send_requests(host: str,
+                        port: int,
+                        requests: List[Dict[str, Any]]
+                        ) -> List[Dict[str, Any]]:
+    """
+    Minimal gateway client, sends requests over one connection.
+    :param host: Address of the gateway.
+    :param port: Port of the gateway.
+    :param requests: Requests, see BidGateway.
+    :return: Responses, in request order.
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    responses = []
+    for request in requests:
+        writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+async def _localhost_demo(batch_size: int) -> None:
+    """
+    Runs one auction instance whose bids only come through the gateway, against an in-process chain.
+    """
+    from functools import partial
+    from pathlib import Path
+    from web3 import EthereumTesterProvider
+    from src.auction import Auction
+    from src.helpers.utils.file_helper import get_bidders
+    from src.key_registry import KeyRegistry
+
+    auction = Auction(provider=EthereumTesterProvider())
+    auctioneer = auction.setup()
+    gateway = BidGateway(partial(auction.submit_bids, batch_size=batch_size), auction.open_batched_bid,
+                         auction.register_key, batch_size)
+    host, port = await gateway.start()
+
+    devices = get_bidders(Path('bidders.json'))
+    registry = KeyRegistry()
+    keys = [device.public_key for device in devices] + [auctioneer.public_key]
+    responses = await send_requests(host, port, [{'type': 'key', 'pem': key.exportKey().hex()} for key in keys])
+    registry.update({response['index']: key.exportKey() for response, key in zip(responses, keys)})
+
+    auction.start(0)
+    bids = []
+    for index, device in enumerate(devices):
+        device.address = f'device-{index}'
+        device.auctioneer_pub_key = auctioneer.public_key
+        device.make_ring(keys)
+        c_quantity, c_bid_value, sig = device.bid()
+        bids.append({'type': 'bid', 'auction_id': 0, 'identifier': device.address, 'c_quantity': c_quantity.hex(),
+                     'c_bid_value': c_bid_value.hex(), 'sig': sig.hex(), 'ring': device.export_ring(registry).hex(),
+                     'bidder_type': device.bidder_type})
+
+    # Every device uses its own connection.
+    proofs = await asyncio.gather(*(send_requests(host, port, [bid]) for bid in bids))
+    auction.end_place_bid(0)
+    openings = [{'type': 'open', 'auction_id': 0, 'root': proof['root'], 'position': proof['position'],
+                 'tau_1': device.tau_1.hex(), 'tau_2': device.tau_2.hex()} for device, (proof,) in zip(devices, proofs)]
+    await asyncio.gather(*(send_requests(host, port, [opening]) for opening in openings))
+    auction.end_open_bid(0)
+    await gateway.stop()
+    print(f'Gateway: {gateway.submitted} bids submitted, {gateway.rejected} requests rejected.')
+    auction.clear([0])
+
+
+if __name__ == '__main__':
+    asyncio.run(_localhost_demo(batch_size=4))
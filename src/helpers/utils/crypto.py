@@ -4,14 +4,15 @@
 # ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
 
 import logging
-from typing import Union, List, Tuple
+from typing import Optional, Union, List, Tuple
 from Crypto.Cipher import PKCS1_OAEP
 from Crypto.PublicKey import RSA
 from hashlib import sha256
-from random import randint
 from functools import reduce
 from sys import byteorder
 
+from src.helpers.utils.randomness import RandomnessProvider, default_provider
+
 
 __author__ = 'Denis Verstraeten'
 __date__ = '2020.3.9'
@@ -19,6 +20,9 @@ __date__ = '2020.3.9'
 
 # --- Constants --- #
 SEP = b' - '
+FORMAT_V1 = 1  # One ring signature and one cipher text per commitment (quantity and bid value).
+FORMAT_V2 = 2  # One ring signature and one cipher text covering both commitments.
+FORMAT_V2_TAG = b'v2'  # First field of a version 2 signature.
 
 
 # RSA encryption/decryption
@@ -119,7 +123,8 @@ def __decrypt(cipher: bytes,
 # Credit: https://en.wikipedia.org/wiki/Ring_signature#Python_implementation
 def sign(keys: List[RSA.RsaKey],
          s: int,
-         msg: bytes
+         msg: bytes,
+         rng: Optional[RandomnessProvider] = None
          ) -> bytes:
     """
     RSA based ring signature. Modified scheme to be able not to use E_k^-1 by closing the loop.
@@ -128,27 +133,29 @@ def sign(keys: List[RSA.RsaKey],
     :param keys: List of RSA keys. All of them are only public except the one of the signer which is also private.
     :param s: Index of the key of the signer in the list keys.
     :param msg: Message to be signed.
+    :param rng: Source of the random values. Defaults to the shared OS randomness provider.
     :return: Signature.
     :rtype: list
     """
+    rng = rng or default_provider
 
     logging.debug(f'Signing message {msg.hex()}.')
     k = sha256(msg).digest()
     logging.debug(f'Key is {k.hex()}.')
-    v_prime = randint(0, 2**256 - 1)
+    v_prime = rng.randint()
     logging.debug(f"v' = {v_prime}.")
     signature = [None] * len(keys)
     v = __E_k(v_prime.to_bytes(int(2048 / 8), byteorder), k)
     for i in range(s + 1, len(keys)):
 
-        signature[i] = randint(0, 2**256 - 1)  # x_i in algorithm.
+        signature[i] = rng.below(keys[i].n)  # x_i in algorithm, uniform in Z_n so that it looks like x_s.
         y = __RSA_mult(signature[i], keys[i].e, keys[i].n)
         v = __E_k((v ^ y).to_bytes(int(2048 / 8), byteorder), k)
 
     glue = v
     for i in range(s):
 
-        signature[i] = randint(0, 2 ** 256 - 1)  # x_i in algorithm.
+        signature[i] = rng.below(keys[i].n)  # x_i in algorithm, uniform in Z_n so that it looks like x_s.
         y = __RSA_mult(signature[i], keys[i].e, keys[i].n)
         v = __E_k((v ^ y).to_bytes(int(2048 / 8), byteorder), k)
 
@@ -220,13 +227,15 @@ def __RSA_mult(x: int,
 
 # SHA256 based commitment
 def commit(msg: bytes,
+           rng: Optional[RandomnessProvider] = None
            ) -> Tuple[bytes, bytes]:
     """
     Commits to a message. Uses sha256: c = sha256(msg||r).
     :param msg: Message to be committed.
+    :param rng: Source of the randomness r. Defaults to the shared OS randomness provider.
     :return: Commitment.
     """
-    r = randint(0, 2**256 - 1).to_bytes(int(256 / 8), byteorder)
+    r = (rng or default_provider).nonce(int(256 / 8))
     c = sha256(msg + r).digest()
     logging.debug(f'Commitment: c = {c.hex()}, r = {r.hex()}.')
     return c, r
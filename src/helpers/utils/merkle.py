@@ -0,0 +1,104 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from typing import List
+from hashlib import sha256
+
+
+# --- Constants --- #
+LEAF_PREFIX = b'\x00'  # Domain separation between leaves and inner nodes.
+NODE_PREFIX = b'\x01'
+FIELD_LENGTH_SIZE = 4  # Bytes of the big endian length prefixed to every field of a leaf.
+
+
+# SHA256 based Merkle tree
+def merkle_leaf(*fields: bytes
+                ) -> bytes:
+    """
+    :param fields: Fields of the committed record. Every field is prefixed with its length, so that two different
+    records never hash the same bytes.
+    :return: Leaf hash of the record.
+    """
+    return sha256(LEAF_PREFIX + b''.join(map(lambda field: len(field).to_bytes(FIELD_LENGTH_SIZE, 'big') + field,
+                                             fields))).digest()
+
+
+def merkle_tree(leaves: List[bytes]
+                ) -> List[List[bytes]]:
+    """
+    Builds a Merkle tree. The last node of a level with an odd number of nodes is promoted to the next level as is,
+    so that no leaf is ever included twice.
+    :param leaves: Leaf hashes.
+    :return: Levels of the tree, from the leaves up to the root.
+    """
+    if not leaves:
+        raise ValueError('Cannot build a Merkle tree without leaves.')
+
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [sha256(NODE_PREFIX + level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        levels.append(parents + level[-1:] if len(level) % 2 else parents)
+
+    logging.debug(f'Merkle root: {levels[-1][0].hex()}.')
+    return levels
+
+
+def merkle_proof(levels: List[List[bytes]],
+                 index: int
+                 ) -> List[bytes]:
+    """
+    :param levels: Levels of the tree, as built by merkle_tree.
+    :param index: Position of the leaf.
+    :return: Inclusion proof of the leaf, i.e. its siblings from the bottom of the tree up to the root. Levels where
+    the node is promoted have no sibling.
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+
+        index //= 2
+
+    return proof
+
+
+def merkle_verify(leaf: bytes,
+                  index: int,
+                  size: int,
+                  proof: List[bytes],
+                  root: bytes
+                  ) -> bool:
+    """
+    Checks whether leaf is included at position index in the tree of size leaves of root root.
+    :param leaf: Leaf hash.
+    :param index: Position of the leaf.
+    :param size: Number of leaves of the tree, as committed together with its root.
+    :param proof: Inclusion proof of the leaf.
+    :param root: Merkle root.
+    :return: Check status.
+    """
+    if not 0 <= index < size:
+        return False
+
+    node = leaf
+    siblings = iter(proof)
+    while size > 1:
+        if index ^ 1 < size:
+            sibling = next(siblings, None)
+            if sibling is None:
+                return False
+
+            if index % 2:
+                node = sha256(NODE_PREFIX + sibling + node).digest()
+            else:
+                node = sha256(NODE_PREFIX + node + sibling).digest()
+
+        index //= 2
+        size = (size + 1) // 2
+
+    return next(siblings, None) is None and node == root
@@ -0,0 +1,121 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+import os
+from random import Random
+from sys import byteorder
+from threading import Lock
+from typing import Optional
+from weakref import WeakSet
+
+
+# --- Constants --- #
+NONCE_SIZE = int(256 / 8)  # Size of commitment randomness and ring signature values.
+BUFFER_SIZE = 1 << 16  # Bytes drawn from the OS at once.
+
+_providers = WeakSet()  # Live providers, emptied in forked processes.
+
+
+class RandomnessProvider:
+    """
+    This class hands out fixed-size nonces from a buffer which is filled in bulk from the CSPRNG of the OS, instead
+    of drawing every nonce separately. A seeded provider draws from a deterministic generator instead, for
+    reproducible benchmark runs only: its nonces are predictable and must never be used for real bids.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 buffer_size: Optional[int] = BUFFER_SIZE,
+                 seed: Optional[int] = None
+                 ) -> None:
+        """
+        :param buffer_size: Number of bytes drawn at once.
+        :param seed: If set, nonces are drawn from a deterministic generator seeded with seed.
+        """
+        logging.info(f'Creating {"seeded" if seed is not None else "OS"} randomness provider.')
+        self.buffer_size = buffer_size
+        self.seeded = seed is not None
+        self.__generator = Random(seed) if self.seeded else None
+        self.__lock = Lock()
+        self.__buffer = b''
+        self.__position = 0
+        _providers.add(self)
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def nonce(self,
+              size: Optional[int] = NONCE_SIZE
+              ) -> bytes:
+        """
+        :param size: Size of the nonce in bytes.
+        :return: Random bytes.
+        """
+        with self.__lock:
+            if self.__position + size > len(self.__buffer):
+                self.__fill(size)
+
+            nonce = self.__buffer[self.__position: self.__position + size]
+            self.__position += size
+            return nonce
+
+    def randint(self,
+                size: Optional[int] = NONCE_SIZE
+                ) -> int:
+        """
+        :param size: Size of the nonce in bytes.
+        :return: Random integer in [0, 2**(8 * size) - 1].
+        """
+        return int.from_bytes(self.nonce(size), byteorder)
+
+    def below(self,
+              bound: int
+              ) -> int:
+        """
+        :param bound: Exclusive upper bound, e.g. an RSA modulus.
+        :return: Random integer uniformly distributed in [0, bound - 1], drawn by rejection sampling.
+        """
+        size = (bound.bit_length() + 7) // 8
+        excess = 8 * size - bound.bit_length()  # Extra bits drawn, dropped so that at most half the draws are rejected.
+        while True:
+            value = self.randint(size) >> excess
+            if value < bound:
+                return value
+
+    def __fill(self,
+               size: int
+               ) -> None:
+        """
+        Replaces the consumed buffer with at least size fresh bytes.
+        """
+        length = max(self.buffer_size, size)
+        if self.seeded:
+            self.__buffer = self.__generator.getrandbits(8 * length).to_bytes(length, byteorder)
+        else:
+            self.__buffer = os.urandom(length)
+
+        self.__position = 0
+
+    def _discard(self) -> None:
+        """
+        Drops the buffered bytes, so that a forked process never hands out the nonces of its parent.
+        """
+        self.__lock = Lock()
+        self.__buffer, self.__position = b'', 0
+
+
+def _after_fork() -> None:
+    """
+    Empties the buffers of every provider in a forked process.
+    """
+    for provider in _providers:
+        provider._discard()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+# Shared provider used when none is injected.
+default_provider = RandomnessProvider()
@@ -0,0 +1,152 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from typing import List, Dict, Iterable, Any
+from Crypto.PublicKey import RSA
+
+
+# --- Constants --- #
+RING_INDEX_SIZE = 4  # Bytes per registry index in a packed ring.
+
+
+def pack_ring(indices: Iterable[int]
+              ) -> bytes:
+    """
+    :param indices: Registry indices of the keys of a ring.
+    :return: Compact encoding of the ring, RING_INDEX_SIZE big endian bytes per key.
+    """
+    return b''.join(map(lambda index: index.to_bytes(RING_INDEX_SIZE, 'big'), indices))
+
+
+def unpack_ring(ring: bytes
+                ) -> List[int]:
+    """
+    :param ring: Compact encoding of a ring, as produced by pack_ring.
+    :return: Registry indices of the keys of the ring.
+    """
+    if len(ring) % RING_INDEX_SIZE:
+        raise ValueError(f'Ring length {len(ring)} is not a multiple of {RING_INDEX_SIZE}.')
+
+    return [int.from_bytes(ring[i: i + RING_INDEX_SIZE], 'big') for i in range(0, len(ring), RING_INDEX_SIZE)]
+
+
+class KeyRegistry:
+    """
+    This class handles a local, indexed mirror of the public key registry of the smart contract. Keys are imported
+    at most once, the first time a ring refers to them.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self) -> None:
+        self.__pems = []  # Registry index -> PEM export of the key.
+        self.__indices = {}  # PEM export of the key -> registry index.
+        self.__keys = {}  # Registry index -> imported key.
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def sync(self,
+             contract: Any
+             ) -> int:
+        """
+        Fetches the keys registered on chain since the last synchronisation.
+        :param contract: Contract object holding the registry.
+        :return: Number of new keys.
+        """
+        count = contract.functions.keyCount().call()
+        new_keys = count - len(self.__pems)
+        for index in range(len(self.__pems), count):
+            self.__add(index, contract.functions.keys(index).call())
+
+        logging.info(f'Key registry synchronised, {new_keys} new keys.')
+        return new_keys
+
+    def update(self,
+               pems: Dict[int, bytes]
+               ) -> None:
+        """
+        Adds keys to the mirror, e.g. the part of the registry shipped to a worker process. Known keys are skipped.
+        :param pems: PEM exports of keys, keyed by registry index.
+        """
+        for index, pem in pems.items():
+            if index >= len(self.__pems) or self.__pems[index] is None:
+                self.__add(index, pem)
+
+    def ring_pems(self,
+                  rings: Iterable[bytes]
+                  ) -> Dict[int, bytes]:
+        """
+        :param rings: Compact encodings of rings.
+        :return: PEM exports of the registered keys the rings refer to, keyed by registry index. Malformed rings and
+        unknown indices are skipped, the bid opening rejects them.
+        """
+        pems = {}
+        for ring in rings:
+            try:
+                indices = unpack_ring(ring)
+
+            except ValueError:
+                continue
+
+            for index in indices:
+                if index < len(self.__pems) and self.__pems[index] is not None:
+                    pems[index] = self.__pems[index]
+
+        return pems
+
+    def index_of(self,
+                 key: RSA.RsaKey
+                 ) -> int:
+        """
+        :param key: Public key.
+        :return: Registry index of the key.
+        """
+        return self.__indices[key.publickey().exportKey()]
+
+    def __contains__(self,
+                     key: RSA.RsaKey
+                     ) -> bool:
+        return key.publickey().exportKey() in self.__indices
+
+    def key(self,
+            index: int
+            ) -> RSA.RsaKey:
+        """
+        :param index: Registry index.
+        :return: Public key, imported on first use.
+        """
+        if index not in self.__keys:
+            if index >= len(self.__pems) or self.__pems[index] is None:
+                raise KeyError(f'No key registered at index {index}.')
+
+            self.__keys[index] = RSA.importKey(self.__pems[index])
+
+        return self.__keys[index]
+
+    def resolve(self,
+                ring: bytes
+                ) -> List[RSA.RsaKey]:
+        """
+        :param ring: Compact encoding of a ring.
+        :return: Public keys of the ring.
+        """
+        return [self.key(index) for index in unpack_ring(ring)]
+
+    def __add(self,
+              index: int,
+              pem: bytes
+              ) -> None:
+        """
+        Stores the PEM export of the key registered at index.
+        """
+        if index >= len(self.__pems):
+            self.__pems.extend([None] * (index + 1 - len(self.__pems)))
+
+        self.__pems[index] = pem
+        self.__indices[pem] = index
+
+    def __len__(self) -> int:
+        return len(self.__pems)
@@ -0,0 +1,305 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+import os
+from pathlib import Path
+from typing import Optional, List, Tuple, Iterator, Union
+import numpy as np
+
+from src.allocation import allocate_side
+from src.scenarios import clear_levels
+
+
+class OrderBook:
+    """
+    This class handles a memory-mapped, columnar on-disk order book. Opened bids are appended as they are verified
+    and clearing runs over the file in chunks, so that the size of an auction is not bounded by RAM. The file can be
+    mapped by other processes, e.g. a reporting job, without copying.
+    File layout: a 64 bytes header followed by one column per field, each column holding capacity rows.
+    """
+
+    # --- Constants --- #
+    MAGIC = b'SDABOOK1'
+    HEADER = np.dtype([
+        ('magic', 'S8'),
+        ('capacity', '<u8'),
+        ('count', '<u8'),
+        ('clearing_quantity', '<f8'),
+        ('clearing_price', '<f8'),
+        ('clearing_type', '<i8'),
+        ('address_size', '<u8')
+    ])
+    HEADER_SIZE = 64
+    ADDRESS_SIZE = 42  # Bytes of a hex encoded Ethereum address.
+    COLUMNS = [
+        ('address', 'S'),  # Sized when the book is created.
+        ('price', '<i8'),
+        ('quantity', '<i8'),
+        ('bidder_type', 'i1'),
+        ('status', 'i1'),
+        ('fill', '<i8')
+    ]
+    CHUNK_SIZE = 1 << 20  # Rows processed at once when clearing.
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 capacity: Optional[int] = 1024,
+                 mode: Optional[str] = 'w+',
+                 address_size: Optional[int] = ADDRESS_SIZE
+                 ) -> None:
+        """
+        :param path: Path of the file. Missing parent directories are created.
+        :param capacity: Number of rows allocated when the file is created. The file grows when it is full.
+        :param mode: 'w+' creates a new file, 'r+' opens an existing file and 'r' maps an existing file read only.
+        :param address_size: Max size in bytes of the bidder addresses or identifiers, when the file is created.
+        """
+        logging.info(f'Opening order book {path} ({mode}).')
+        self.path = Path(path)
+        self.__mode = 'r+' if mode == 'w+' else mode
+        if mode == 'w+':
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            OrderBook.__create(self.path, max(capacity, 1), max(address_size, 1))
+
+        self.__map()
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def append(self,
+               address: str,
+               quantity: int,
+               bid_value: int,
+               bidder_type: int,
+               status: Optional[bool] = True
+               ) -> None:
+        """
+        Appends an opened bid. Raises ValueError if the address or a value does not fit its column.
+        :param address: Address of the bidder.
+        :param quantity: Opened quantity.
+        :param bid_value: Opened bid value.
+        :param bidder_type: 0 for sellers and 1 for buyers.
+        :param status: Whether the opening was successful.
+        """
+        encoded = address.encode('utf-8')
+        if len(encoded) > self.columns['address'].itemsize:
+            raise ValueError(f'Address {address} is longer than {self.columns["address"].itemsize} bytes.')
+
+        limit = np.iinfo(np.int64)
+        if not (limit.min <= quantity <= limit.max and limit.min <= bid_value <= limit.max):
+            raise ValueError(f'Quantity {quantity} or bid value {bid_value} out of range.')
+
+        count = len(self)
+        if count == self.__header['capacity'][0]:
+            self.__grow(2 * count)
+
+        self.columns['address'][count] = encoded
+        self.columns['price'][count] = bid_value
+        self.columns['quantity'][count] = quantity
+        self.columns['bidder_type'][count] = bidder_type
+        self.columns['status'][count] = status
+        self.columns['fill'][count] = 0
+        self.__header['count'] = count + 1
+
+    def levels(self,
+               chunk_size: Optional[int] = CHUNK_SIZE
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Aggregates the valid bids per price level, one chunk at a time.
+        :param chunk_size: Number of rows read at once.
+        :return: Price levels (ascending), demand and supply quantity at every level.
+        """
+        levels = np.zeros(0, dtype=np.int64)
+        demand = np.zeros(0)
+        supply = np.zeros(0)
+        for rows in self.__chunks(chunk_size):
+            valid = self.columns['status'][rows] != 0
+            price = self.columns['price'][rows][valid]
+            quantity = self.columns['quantity'][rows][valid]
+            buyers = self.columns['bidder_type'][rows][valid] != 0
+
+            levels, index = np.unique(np.concatenate((levels, price)), return_inverse=True)
+            old, new = index[:len(demand)], index[len(demand):]
+            demand = np.bincount(np.concatenate((old, new[buyers])),
+                                 weights=np.concatenate((demand, quantity[buyers])), minlength=len(levels))
+            supply = np.bincount(np.concatenate((old, new[~buyers])),
+                                 weights=np.concatenate((supply, quantity[~buyers])), minlength=len(levels))
+
+        return levels, demand, supply
+
+    def clear(self,
+              chunk_size: Optional[int] = CHUNK_SIZE
+              ) -> Tuple[int, Union[int, float], int]:
+        """
+        Computes the clearing of the book, see Auctioneer.get_uniform_price, and stores it in the header.
+        :param chunk_size: Number of rows read at once.
+        :return: Clearing quantity, clearing price and clearing type.
+        """
+        levels, demand, supply = self.levels(chunk_size)
+        clearing = clear_levels(levels, demand[None, :], supply[None, :])
+        clearing_type = int(clearing['type'][0])
+        price = clearing['price'][0]
+        self.__header['clearing_quantity'] = clearing['quantity'][0]
+        self.__header['clearing_price'] = price
+        self.__header['clearing_type'] = clearing_type
+        return int(clearing['quantity'][0]), float(price) if clearing_type == 3 else int(price), clearing_type
+
+    def clearing(self) -> Tuple[int, float, int]:
+        """
+        :return: Clearing quantity, clearing price and clearing type stored by clear.
+        """
+        return (int(self.__header['clearing_quantity'][0]), float(self.__header['clearing_price'][0]),
+                int(self.__header['clearing_type'][0]))
+
+    def allocate(self,
+                 clearing_quantity: int,
+                 chunk_size: Optional[int] = CHUNK_SIZE
+                 ) -> None:
+        """
+        Computes the fill of every bid, see allocation.allocate, and stores it in the fill column. Price levels which
+        are completely traded or not traded at all are filled chunk by chunk, only the rows of the marginal level of
+        each side are gathered to share it pro-rata.
+        :param clearing_quantity: Quantity traded in the auction.
+        :param chunk_size: Number of rows read at once.
+        """
+        levels, demand, supply = self.levels(chunk_size)
+        demand_fill = np.clip(clearing_quantity - (demand.sum() - np.cumsum(demand)), 0, demand)
+        supply_fill = np.clip(clearing_quantity - (np.cumsum(supply) - supply), 0, supply)
+        marginal = {True: [], False: []}
+        for rows in self.__chunks(chunk_size):
+            valid = self.columns['status'][rows] != 0
+            buyers = self.columns['bidder_type'][rows] != 0
+            if len(levels) == 0:
+                self.columns['fill'][rows] = 0
+                continue
+
+            level = np.minimum(np.searchsorted(levels, self.columns['price'][rows]), len(levels) - 1)
+            level_fill = np.where(buyers, demand_fill[level], supply_fill[level])
+            level_quantity = np.where(buyers, demand[level], supply[level])
+            full = valid & (level_fill == level_quantity)
+            self.columns['fill'][rows] = np.where(full, self.columns['quantity'][rows], 0)
+
+            partial = valid & (level_fill > 0) & (level_fill < level_quantity)
+            for side in (True, False):
+                marginal[side].append(np.flatnonzero(partial & (buyers == side)) + rows.start)
+
+        for side, level_fill in ((True, demand_fill), (False, supply_fill)):
+            rows = np.concatenate(marginal[side]) if marginal[side] else np.zeros(0, dtype=np.int64)
+            if len(rows):
+                price = self.columns['price'][rows]
+                fill = int(level_fill[np.searchsorted(levels, price[0])])
+                self.columns['fill'][rows] = allocate_side(price, self.columns['quantity'][rows], fill, side)
+
+    def allocation(self,
+                   chunk_size: Optional[int] = CHUNK_SIZE
+                   ) -> Iterator[Tuple[List[str], List[int]]]:
+        """
+        :param chunk_size: Number of rows read at once.
+        :return: Addresses and fills of the valid bids, one chunk at a time.
+        """
+        for rows in self.__chunks(chunk_size):
+            valid = self.columns['status'][rows] != 0
+            addresses = [address.decode('utf-8') for address in self.columns['address'][rows][valid]]
+            yield addresses, self.columns['fill'][rows][valid].tolist()
+
+    def flush(self) -> None:
+        """
+        Writes the pending changes to disk.
+        """
+        if self.__mode != 'r':
+            self.__header.flush()
+            for column in self.columns.values():
+                column.flush()
+
+    def __chunks(self,
+                 chunk_size: int
+                 ) -> Iterator[slice]:
+        """
+        :return: Row ranges of at most chunk_size rows covering the book.
+        """
+        count = len(self)
+        for start in range(0, count, chunk_size):
+            yield slice(start, min(start + chunk_size, count))
+
+    @staticmethod
+    def __create(path: Path,
+                 capacity: int,
+                 address_size: int
+                 ) -> None:
+        """
+        Creates an empty book file with room for capacity rows.
+        """
+        header = np.zeros(1, dtype=OrderBook.HEADER)
+        header['magic'] = OrderBook.MAGIC
+        header['capacity'] = capacity
+        header['address_size'] = address_size
+        with open(path, 'wb') as file:
+            file.write(header.tobytes().ljust(OrderBook.HEADER_SIZE, b'\0'))
+            file.truncate(OrderBook.__offsets(capacity, address_size)[-1])
+
+    @staticmethod
+    def __dtypes(address_size: int
+                 ) -> List[Tuple[str, np.dtype]]:
+        """
+        :return: Name and type of every column.
+        """
+        return [(name, np.dtype(f'S{address_size}') if dtype == 'S' else np.dtype(dtype))
+                for name, dtype in OrderBook.COLUMNS]
+
+    @staticmethod
+    def __offsets(capacity: int,
+                  address_size: int
+                  ) -> List[int]:
+        """
+        :return: Offset of every column followed by the size of the file, columns being aligned on 8 bytes.
+        """
+        offsets = [OrderBook.HEADER_SIZE]
+        for _, dtype in OrderBook.__dtypes(address_size):
+            size = capacity * dtype.itemsize
+            offsets.append(offsets[-1] + (size + 7) // 8 * 8)
+
+        return offsets
+
+    def __map(self) -> None:
+        """
+        Maps the header and the columns of the file.
+        """
+        self.__header = np.memmap(self.path, dtype=OrderBook.HEADER, mode=self.__mode, shape=(1,))
+        if self.__header['magic'][0] != OrderBook.MAGIC:
+            raise ValueError(f'{self.path} is not an order book.')
+
+        capacity = int(self.__header['capacity'][0])
+        address_size = int(self.__header['address_size'][0])
+        offsets = OrderBook.__offsets(capacity, address_size)
+        self.columns = {name: np.memmap(self.path, dtype=dtype, mode=self.__mode, offset=offset, shape=(capacity,))
+                        for (name, dtype), offset in zip(OrderBook.__dtypes(address_size), offsets)}
+
+    def __grow(self,
+               capacity: int
+               ) -> None:
+        """
+        Moves the book to a larger file.
+        :param capacity: New number of rows.
+        """
+        logging.info(f'Growing order book {self.path} to {capacity} rows.')
+        count = len(self)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        OrderBook.__create(tmp_path, capacity, self.columns['address'].itemsize)
+        grown = OrderBook(tmp_path, mode='r+')
+        for name, column in self.columns.items():
+            grown.columns[name][:count] = column[:count]
+
+        grown.__header['count'] = count
+        grown.flush()
+        del grown
+        self.flush()
+        self.__header = None
+        self.columns = None
+        os.replace(tmp_path, self.path)
+        self.__map()
+
+    def __len__(self) -> int:
+        return int(self.__header['count'][0])
@@ -1,6 +1,7 @@
 #from __future__ import annotations
 import logging
 from abc import ABC
+from typing import Union
 from Crypto.PublicKey import RSA
 
 
@@ -26,4 +27,20 @@ class Participant(ABC):
 
         else:
             self._RSA_key = None
-            self.public_key = None
\ No newline at end of file
+            self.public_key = None
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def export_key(self) -> bytes:
+        """
+        :return: PEM export of the private RSA key, e.g. to hand it over to a worker process.
+        """
+        return self._RSA_key.exportKey()
+
+    def import_key(self, key: Union[bytes, RSA.RsaKey]) -> None:
+        """
+        Replaces the RSA keys of the participant.
+        :param key: Private RSA key or its PEM export.
+        """
+        self._RSA_key = key if isinstance(key, RSA.RsaKey) else RSA.importKey(key)
+        self.public_key = self._RSA_key.publickey()
@@ -0,0 +1,198 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any
+import numpy as np
+
+from src.allocation import order_book
+
+
+def clear_levels(levels: np.ndarray,
+                 demand: np.ndarray,
+                 supply: np.ndarray
+                 ) -> Dict[str, np.ndarray]:
+    """
+    Vectorized counterpart of Auctioneer.get_uniform_price, for many order books.
+    The clearing quantity is the largest quantity at which the demand price is still above the supply price, the
+    marginal side and the clearing price follow the same rules as Auctioneer.get_uniform_price. Levels without any
+    quantity do not change the clearing, as get_uniform_price never sees bids of quantity 0: they are rejected at
+    opening.
+    :param levels: Price levels, ascending. Either shared by every order book, or one row per order book.
+    :param demand: Demand quantity at every price level, one row per order book.
+    :param supply: Supply quantity at every price level, one row per order book.
+    :return: Clearing quantity, clearing price and clearing type of every order book. Books which do not cross
+    have a clearing type 0.
+    """
+    rows = np.arange(demand.shape[0])
+    levels = np.broadcast_to(levels, demand.shape)
+    if levels.shape[1] == 0:
+        return {'quantity': np.zeros(len(rows)), 'price': np.zeros(len(rows)), 'type': np.zeros(len(rows), dtype=int)}
+
+    cumulative_demand = np.cumsum(demand[:, ::-1], axis=1)[:, ::-1]  # Demand at a price or above.
+    cumulative_supply = np.cumsum(supply, axis=1)  # Supply at a price or below.
+    quantity = np.minimum(cumulative_demand, cumulative_supply).max(axis=1, initial=0)
+
+    crossed = quantity > 0
+    demand_level = np.maximum((cumulative_demand >= quantity[:, None]).sum(axis=1) - 1, 0)
+    supply_level = np.minimum(levels.shape[1] - (cumulative_supply >= quantity[:, None]).sum(axis=1),
+                              levels.shape[1] - 1)
+    marginal_demand = cumulative_demand[rows, demand_level]
+    marginal_supply = cumulative_supply[rows, supply_level]
+
+    clearing_type = np.where(marginal_demand > marginal_supply, 2, np.where(marginal_demand < marginal_supply, 1, 3))
+    demand_price = levels[rows, demand_level]
+    supply_price = levels[rows, supply_level]
+    price = np.where(clearing_type == 2, demand_price,
+                     np.where(clearing_type == 1, supply_price, (demand_price + supply_price) / 2))
+    return {
+        'quantity': np.where(crossed, quantity, 0),
+        'price': np.where(crossed, price, 0),
+        'type': np.where(crossed, clearing_type, 0)
+    }
+
+
+def _run_chunk(engine: 'ScenarioEngine',
+               quantity: np.ndarray,
+               price_cap: np.ndarray
+               ) -> Dict[str, np.ndarray]:
+    """
+    Clears a chunk of scenarios in a worker process.
+    """
+    return engine._run(quantity, price_cap)
+
+
+class ScenarioEngine:
+    """
+    This class clears many what-if scenarios of one opened order book in a single vectorized pass. Scenarios
+    scale quantities, remove bidders or cap prices; the sorted price levels are computed once and shared, every
+    scenario only adding one level for its own price cap.
+    """
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 price: np.ndarray,
+                 quantity: np.ndarray,
+                 bidder_type: np.ndarray
+                 ) -> None:
+        """
+        :param price: Bid values of the opened bids.
+        :param quantity: Quantities of the opened bids.
+        :param bidder_type: Types of the bidders, 0 for sellers and 1 for buyers.
+        """
+        logging.info(f'Creating scenario engine for {len(price)} bids.')
+        self.price = np.asarray(price)
+        self.quantity = np.asarray(quantity, dtype=np.float64)
+        self.buyers = np.asarray(bidder_type) != 0
+
+    @classmethod
+    def from_bidders(cls,
+                     bidders: Dict[str, Dict[str, Any]]
+                     ) -> 'ScenarioEngine':
+        """
+        :param bidders: Opened bids, as stored in Auctioneer.bidders.
+        :return: Scenario engine over the valid bids.
+        """
+        _, price, quantity, bidder_type = order_book(bidders)
+        return cls(price, quantity, bidder_type)
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def run(self,
+            quantity_scale: Optional[np.ndarray] = None,
+            active: Optional[np.ndarray] = None,
+            price_cap: Optional[np.ndarray] = None,
+            processes: Optional[int] = None,
+            chunk_size: Optional[int] = 10000
+            ) -> Dict[str, np.ndarray]:
+        """
+        Clears every scenario. Scenario parameters are broadcast to (scenarios, bids).
+        :param quantity_scale: Factor applied to the quantity of every bid.
+        :param active: Whether every bid takes part in the scenario.
+        :param price_cap: Price cap of every scenario. Sellers above the cap are withdrawn, buyers above the cap bid
+        the cap.
+        :param processes: If set, scenarios are spread over this many processes, in chunks of chunk_size scenarios.
+        :param chunk_size: Number of scenarios per chunk when running over several processes.
+        :return: Clearing quantity, clearing price and clearing type of every scenario.
+        """
+        n = len(self.price)
+        quantity = self.quantity * (1 if quantity_scale is None else np.asarray(quantity_scale, dtype=np.float64))
+        if active is not None:
+            quantity = quantity * np.asarray(active, dtype=bool)
+
+        scenarios = max(np.shape(quantity)[0] if np.ndim(quantity) == 2 else 1, np.size(price_cap))
+        quantity = np.broadcast_to(quantity, (scenarios, n))
+        price_cap = np.broadcast_to(np.inf if price_cap is None else np.asarray(price_cap, dtype=np.float64),
+                                    (scenarios,))
+
+        if processes is not None and scenarios > chunk_size:
+            return self.__run_parallel(quantity, price_cap, processes, chunk_size)
+
+        return self._run(quantity, price_cap)
+
+    def _run(self,
+             quantity: np.ndarray,
+             price_cap: np.ndarray
+             ) -> Dict[str, np.ndarray]:
+        """
+        Clears a block of scenarios.
+        :param quantity: Quantity of every bid, one row per scenario.
+        :param price_cap: Price cap of every scenario.
+        :return: Output of clear_levels.
+        """
+        scenarios, n = quantity.shape
+        prices = np.unique(self.price).astype(np.float64)
+        width = len(prices) + 1  # Shared price levels and the cap level of the scenario.
+
+        # A cap between two prices gets the extra level of its scenario, a cap equal to a price uses the level of
+        # that price. Unused extra levels are put on top, empty.
+        capped = np.isfinite(price_cap)
+        cap = np.where(capped, price_cap, np.inf)
+        position = np.searchsorted(prices, cap)
+        exact = position < len(prices)
+        exact[exact] = prices[position[exact]] == cap[exact]
+        extra_level = np.where(capped & ~exact, position, len(prices))
+        cap_level = np.where(capped, position, width - 1)
+
+        columns = np.arange(width)
+        shifted = columns[None, :] > extra_level[:, None]
+        top = prices[-1] if len(prices) else 0
+        levels = np.where(columns[None, :] == extra_level[:, None], np.where(capped & ~exact, cap, top)[:, None],
+                          np.append(prices, top)[np.where(shifted, columns - 1, columns)])
+
+        bid_level = np.searchsorted(prices, self.price)
+        bid_level = bid_level + (bid_level[None, :] >= extra_level[:, None])
+
+        # Buyers above the cap bid the cap, sellers above the cap are withdrawn.
+        bid_level = np.where(self.buyers, np.minimum(bid_level, cap_level[:, None]), bid_level)
+        quantity = np.where(~self.buyers & (self.price > cap[:, None]), 0, quantity)
+
+        flat = np.arange(scenarios)[:, None] * width + bid_level
+        demand = np.bincount(flat[:, self.buyers].ravel(), weights=quantity[:, self.buyers].ravel(),
+                             minlength=scenarios * width).reshape(scenarios, width)
+        supply = np.bincount(flat[:, ~self.buyers].ravel(), weights=quantity[:, ~self.buyers].ravel(),
+                             minlength=scenarios * width).reshape(scenarios, width)
+        return clear_levels(levels, demand, supply)
+
+    def __run_parallel(self,
+                       quantity: np.ndarray,
+                       price_cap: np.ndarray,
+                       processes: int,
+                       chunk_size: int
+                       ) -> Dict[str, np.ndarray]:
+        """
+        Clears the scenarios in chunks over a pool of processes.
+        :return: Output of clear_levels, in scenario order.
+        """
+        starts = range(0, quantity.shape[0], chunk_size)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            outputs = list(executor.map(_run_chunk,
+                                        [self] * len(starts),
+                                        (np.ascontiguousarray(quantity[start:start + chunk_size]) for start in starts),
+                                        (price_cap[start:start + chunk_size] for start in starts)))
+
+        return {key: np.concatenate([output[key] for output in outputs]) for key in outputs[0]}
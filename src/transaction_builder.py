@@ -0,0 +1,199 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import logging
+from typing import Dict, Tuple, Any
+from eth_account import Account
+from hexbytes import HexBytes
+from web3 import Web3
+
+
+class TransactionBuilder:
+    """
+    This class builds and signs smart contract transactions locally, so that sending a transaction only costs one
+    RPC call (eth_sendRawTransaction). Nonces are tracked locally, gas price and chain ID are fetched once and gas
+    limits are cached per contract function and calldata size bucket. Functions whose gas depends on the contract
+    state rather than on their calldata are estimated on every call, and a transaction which runs out of gas is
+    estimated again and resent once.
+    """
+
+    # --- Constants --- #
+    CALLDATA_BUCKET = 128  # Calldata sizes are bucketed by this many bytes.
+    GAS_MARGIN = 1.2  # Safety margin applied to the estimated gas.
+    GAS_PER_BYTE = 641  # Worst case per extra byte of a bucket: 16 gas calldata + 20000 gas storage per 32 bytes.
+    STATE_DEPENDENT = {'settle', 'settleBatches', 'fundAccounts', 'punishBidders'}  # Never cached, see __gas_limit.
+
+    # ------------------------------------------------- CONSTRUCTOR ------------------------------------------------- #
+
+    def __init__(self,
+                 w3: Web3,
+                 contract: Any
+                 ) -> None:
+        """
+        :param w3: Web3 connection.
+        :param contract: Contract object whose functions are called.
+        """
+        logging.info('Creating transaction builder.')
+        self.__w3 = w3
+        self.__contract = contract
+        self.__accounts = {}  # Address -> local account.
+        self.__nonces = {}  # Address -> next nonce.
+        self.__gas_limits = {}  # (function name, calldata bucket) -> gas limit.
+        self.__gas_price = None
+        self.__chain_id = None
+        self.rpc_calls = 0
+
+    # --------------------------------------------------- METHODS --------------------------------------------------- #
+
+    def add_account(self,
+                    private_key: str
+                    ) -> str:
+        """
+        Registers an account whose transactions are signed locally.
+        :param private_key: Private key of the account.
+        :return: Address of the account.
+        """
+        account = Account.from_key(private_key)
+        self.__accounts[account.address] = account
+        return account.address
+
+    def has_account(self,
+                    address: str
+                    ) -> bool:
+        """
+        :return: Whether transactions of address can be signed locally.
+        """
+        return address in self.__accounts
+
+    def send(self,
+             transaction: Dict[str, Any],
+             func_name: str,
+             *args
+             ) -> HexBytes:
+        """
+        Builds, signs and sends a smart contract transaction.
+        :param transaction: Transaction data, 'from' and optional 'value'.
+        :param func_name: Name of the smart contract function to be executed.
+        :param args: Argument to be passed to the function.
+        :return: Transaction hash.
+        """
+        sender = transaction['from']
+        data = self.__contract.encodeABI(fn_name=func_name, args=args)
+        try:
+            return self.__send_raw(sender, func_name, data, transaction.get('value', 0))
+
+        except ValueError as e:
+            if 'out of gas' not in str(e):
+                raise
+
+            logging.info(f'Transaction {func_name} ran out of gas, estimating its gas limit again.')
+            self.__gas_limits.pop(self.__gas_key(func_name, data), None)
+            return self.__send_raw(sender, func_name, data, transaction.get('value', 0))
+
+    def forget_nonce(self,
+                     address: str
+                     ) -> None:
+        """
+        Drops the locally tracked nonce of an account, e.g. after the node signed a transaction of the account.
+        The nonce is fetched again on the next transaction.
+        :param address: Address of the account.
+        """
+        self.__nonces.pop(address, None)
+
+    def __send_raw(self,
+                   sender: str,
+                   func_name: str,
+                   data: str,
+                   value: int
+                   ) -> HexBytes:
+        """
+        Signs and sends a transaction with the cached gas limit and the next local nonce.
+        :return: Transaction hash.
+        """
+        tx = {
+            'to': self.__contract.address,
+            'data': data,
+            'value': value,
+            'gas': self.__gas_limit(sender, func_name, data, value),
+            'gasPrice': self.__get_gas_price(),
+            'nonce': self.__next_nonce(sender),
+            'chainId': self.__get_chain_id()
+        }
+        signed = self.__accounts[sender].sign_transaction(tx)
+        try:
+            self.rpc_calls += 1
+            return self.__w3.eth.sendRawTransaction(signed.rawTransaction)
+
+        except ValueError:
+            self.forget_nonce(sender)  # Nonce may be out of sync, fetch it again on next transaction.
+            raise
+
+    @staticmethod
+    def __gas_key(func_name: str,
+                  data: str
+                  ) -> Tuple[str, int]:
+        """
+        :return: Key of the gas limit cache: function name and calldata bucket.
+        """
+        return func_name, len(HexBytes(data)) // TransactionBuilder.CALLDATA_BUCKET
+
+    def __gas_limit(self,
+                    sender: str,
+                    func_name: str,
+                    data: str,
+                    value: int
+                    ) -> int:
+        """
+        :return: Cached gas limit for the function and calldata bucket, estimated on first use. Functions in
+        STATE_DEPENDENT, e.g. settle whose refunds depend on the deposits held, are estimated on every call.
+        """
+        key = TransactionBuilder.__gas_key(func_name, data)
+        if key not in self.__gas_limits or func_name in TransactionBuilder.STATE_DEPENDENT:
+            self.rpc_calls += 1
+            estimate = self.__w3.eth.estimateGas({
+                'from': sender,
+                'to': self.__contract.address,
+                'data': data,
+                'value': value
+            })
+            self.__gas_limits[key] = int(estimate * TransactionBuilder.GAS_MARGIN) \
+                + TransactionBuilder.GAS_PER_BYTE * TransactionBuilder.CALLDATA_BUCKET
+            logging.info(f'Gas limit of {func_name} for calldata bucket {key[1]}: {self.__gas_limits[key]}.')
+
+        return self.__gas_limits[key]
+
+    def __next_nonce(self,
+                     sender: str
+                     ) -> int:
+        """
+        :return: Next nonce of sender, fetched from the node on first use only.
+        """
+        if sender not in self.__nonces:
+            self.rpc_calls += 1
+            self.__nonces[sender] = self.__w3.eth.getTransactionCount(sender, 'pending')
+
+        nonce = self.__nonces[sender]
+        self.__nonces[sender] += 1
+        return nonce
+
+    def __get_gas_price(self) -> int:
+        """
+        :return: Gas price, fetched from the node on first use only.
+        """
+        if self.__gas_price is None:
+            self.rpc_calls += 1
+            self.__gas_price = self.__w3.eth.gasPrice
+
+        return self.__gas_price
+
+    def __get_chain_id(self) -> int:
+        """
+        :return: Chain ID, fetched from the node on first use only.
+        """
+        if self.__chain_id is None:
+            self.rpc_calls += 1
+            self.__chain_id = self.__w3.eth.chainId
+
+        return self.__chain_id
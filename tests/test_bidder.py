@@ -0,0 +1,49 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import pytest
+
+from src.auctioneer import Auctioneer, REJECT_RANGE
+from src.bidder import Bidder
+from src.helpers.utils.crypto import FORMAT_V1, FORMAT_V2
+
+
+@pytest.fixture(scope='module')
+def auctioneer():
+    return Auctioneer('0x0')
+
+
+@pytest.fixture(scope='module')
+def bidder(auctioneer):
+    bidder = Bidder(bid_value=1, quantity=1, bidder_type=1, address='0x1')
+    bidder.auctioneer_pub_key = auctioneer.public_key
+    bidder.make_ring([bidder.public_key, auctioneer.public_key])
+    return bidder
+
+
+@pytest.mark.parametrize('format_version', [FORMAT_V1, FORMAT_V2])
+@pytest.mark.parametrize('quantity, bid_value', [(Auctioneer.MAX_VALUE + 1, 1), (1, Auctioneer.MAX_VALUE + 1),
+                                                 (0, 1), (-1, 1)])
+def test_out_of_range_bids_are_not_sealed(bidder, format_version, quantity, bid_value):
+    bidder.quantity, bidder.bid_value = quantity, bid_value
+    with pytest.raises(ValueError):
+        bidder.bid(format_version)
+
+
+@pytest.mark.parametrize('format_version', [FORMAT_V1, FORMAT_V2])
+def test_largest_bid_is_opened(auctioneer, bidder, format_version):
+    bidder.quantity = bidder.bid_value = Auctioneer.MAX_VALUE
+    c_quantity, c_bid_value, sig = bidder.bid(format_version)
+    assert auctioneer.bid_opening(bidder.address, bidder.ring, c_quantity, c_bid_value, sig, bidder.tau_1,
+                                  bidder.tau_2, bidder.bidder_type)
+    assert auctioneer.bidders[bidder.address]['quantity'] == Auctioneer.MAX_VALUE
+
+
+def test_zero_quantity_is_rejected_at_opening(auctioneer, bidder):
+    bidder.quantity, bidder.bid_value = 0, 1
+    c_quantity, c_bid_value, sig = bidder._Bidder__bid_v2()  # Skips the range check, as a dishonest bidder would.
+    assert not auctioneer.bid_opening('0x2', bidder.ring, c_quantity, c_bid_value, sig, bidder.tau_1, bidder.tau_2,
+                                      bidder.bidder_type)
+    assert auctioneer.rejections['0x2'] == REJECT_RANGE
@@ -0,0 +1,88 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import json
+import shutil
+from pathlib import Path
+import pytest
+
+pytest.importorskip('web3')
+pytest.importorskip('eth_tester')
+solcx = pytest.importorskip('solcx')
+if not solcx.get_installed_solc_versions():
+    pytest.skip('no solc binary installed, see solcx.install_solc', allow_module_level=True)
+
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_tester.backends.pyevm.main import get_default_genesis_params
+from web3 import Web3, EthereumTesterProvider
+
+from src.auction import Auction
+
+REPOSITORY = Path(__file__).parents[1]
+BIDDERS_FILE = REPOSITORY / 'bidders.json'
+GAS_LIMIT = 30000000  # Rings of every registered key do not fit the default block gas limit.
+
+
+@pytest.fixture
+def chain(tmp_path, monkeypatch):
+    """
+    Deploys the contract compiled by Auction.compile on a fresh in-process EVM. The compiled contract is stored in
+    the temporary directory, as are the keys written by the run.
+    """
+    shutil.copytree(REPOSITORY / 'contracts', tmp_path / 'contracts')
+    monkeypatch.chdir(tmp_path)
+    genesis = get_default_genesis_params(overrides={'gas_limit': GAS_LIMIT})
+    provider = EthereumTesterProvider(EthereumTester(PyEVMBackend(genesis_parameters=genesis)))
+    auction = Auction(provider=provider)
+    auction.setup()
+    with open(tmp_path / 'compile' / 'out.json', 'r') as compiled:
+        data = json.load(compiled)
+
+    w3 = Web3(provider)
+    return auction, w3, w3.eth.contract(address=data['contractAddress'], abi=data['abi'])
+
+
+def tamper(bidder):
+    """
+    Makes the ring signature of every bid sealed by the bidder invalid.
+    """
+    seal = bidder.bid
+
+    def bid(*args, **kwargs):
+        c_quantity, c_bid_value, sig = seal(*args, **kwargs)
+        return c_quantity, c_bid_value, sig[:-1] + bytes([sig[-1] ^ 1])
+
+    bidder.bid = bid
+
+
+def test_bids_placed_on_chain_are_settled_or_punished(chain):
+    auction, w3, contract = chain
+    bidders = auction.create_bidders(0, BIDDERS_FILE)
+    tamper(bidders[0])
+    result = auction.run_auctions({0: bidders}, processes=1)[0]
+
+    assert result['invalid'] == [bidders[0].address] and result['invalid_batched'] == []
+    assert tuple(contract.functions.clearing(0).call()) == tuple(result['clearing'])
+    fills = dict(zip(*result['allocation']))
+    for bidder in bidders[1:]:
+        assert contract.functions.allocation(0, bidder.address).call() == fills[bidder.address]
+
+    assert all(contract.functions.deposit(0, bidder.address).call() == 0 for bidder in bidders)
+    assert contract.functions.totalDeposit(0).call() == 0
+    assert w3.eth.getBalance(contract.address) == Auction.DEPOSIT  # Forfeited by the invalid bidder.
+    auction.start(0)  # Settled instances can be started again.
+
+
+def test_batched_bids_are_settled_and_forfeited(chain):
+    auction, w3, contract = chain
+    bidders = auction.create_bidders(0, BIDDERS_FILE)
+    tamper(bidders[-1])
+    result = auction.run_auctions({0: bidders}, processes=1, batch_size=4)[0]
+
+    assert contract.functions.batchSizes(0).call() == [4, len(bidders) - 4]
+    assert result['invalid'] == [] and result['invalid_batched'] == [bidders[-1].address]
+    assert tuple(contract.functions.clearing(0).call()) == tuple(result['clearing'])
+    assert contract.functions.totalDeposit(0).call() == 0
+    assert w3.eth.getBalance(contract.address) == Auction.DEPOSIT  # One batched bid forfeited.
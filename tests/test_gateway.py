@@ -0,0 +1,181 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import asyncio
+import time
+from pathlib import Path
+import pytest
+
+from src.aggregator import Aggregator, bid_leaf
+from src.auction_pool import open_and_clear
+from src.auctioneer import Auctioneer
+from src.gateway import BidGateway, send_requests
+from src.helpers.utils.crypto import FORMAT_V1, FORMAT_V2
+from src.helpers.utils.file_helper import get_bidders
+from src.helpers.utils.merkle import merkle_verify
+from src.key_registry import KeyRegistry
+
+BIDDERS_FILE = Path(__file__).parents[1] / 'bidders.json'
+
+
+class FakeChain:
+    """
+    Submission path of the gateway backed by one aggregator per auction instance instead of a chain.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.aggregators = {}
+        self.roots = {}
+        self.registry = KeyRegistry()
+        self.pems = []
+        self.submissions = []
+
+    def register_key(self, pem):
+        self.pems.append(pem)
+        self.registry.update({len(self.pems) - 1: pem})
+        return len(self.pems) - 1
+
+    def submit(self, auction_id, bids):
+        time.sleep(self.delay)
+        self.submissions.append(len(bids))
+        aggregator = self.aggregators.setdefault(auction_id, Aggregator(None))  # See Auction.submit_bids.
+        positions = [aggregator.collect(*bid) for bid in bids]
+        for _, root, size in aggregator.seal():
+            self.roots.setdefault(auction_id, {})[root] = size
+
+        return [aggregator.proof(*position) for position in positions]
+
+    def open_bid(self, auction_id, root, position, tau_1, tau_2):
+        if auction_id not in self.aggregators:
+            raise KeyError(auction_id)
+
+        self.aggregators[auction_id].open(root, position, tau_1, tau_2)
+
+
+@pytest.fixture(scope='module')
+def auctioneer():
+    return Auctioneer('0x0')
+
+
+@pytest.fixture
+def chain():
+    return FakeChain()
+
+
+def bid_request(device, auction_id=0):
+    c_quantity, c_bid_value, sig = device.sealed
+    return {'type': 'bid', 'auction_id': auction_id, 'identifier': device.address, 'c_quantity': c_quantity.hex(),
+            'c_bid_value': c_bid_value.hex(), 'sig': sig.hex(), 'ring': device.packed_ring.hex(),
+            'bidder_type': device.bidder_type}
+
+
+def open_request(device, proof, auction_id=0, tau_1=None):
+    return {'type': 'open', 'auction_id': auction_id, 'root': proof['root'], 'position': proof['position'],
+            'tau_1': (tau_1 or device.tau_1).hex(), 'tau_2': device.tau_2.hex()}
+
+
+async def with_gateway(chain, scenario, **options):
+    """
+    Runs a scenario against a gateway listening on localhost.
+    """
+    gateway = BidGateway(chain.submit, chain.open_bid, chain.register_key, **options)
+    host, port = await gateway.start()
+    try:
+        return gateway, await scenario(host, port)
+
+    finally:
+        await gateway.stop()
+
+
+async def seal_bids(host, port, auctioneer, chain):
+    """
+    Registers the keys of the devices through the gateway and seals one bid per device.
+    """
+    devices = get_bidders(BIDDERS_FILE)
+    keys = [device.public_key for device in devices] + [auctioneer.public_key]
+    await send_requests(host, port, [{'type': 'key', 'pem': key.exportKey().hex()} for key in keys])
+    for index, device in enumerate(devices):
+        device.address = f'device-{index}'
+        device.auctioneer_pub_key = auctioneer.public_key
+        device.make_ring(keys)
+        device.sealed = device.bid(FORMAT_V2 if index % 2 else FORMAT_V1)
+        device.packed_ring = device.export_ring(chain.registry)
+
+    return devices
+
+
+def test_bids_are_batched_proven_opened_and_cleared(auctioneer):
+    chain = FakeChain(delay=0.05)
+
+    async def scenario(host, port):
+        devices = await seal_bids(host, port, auctioneer, chain)
+        proofs = await asyncio.gather(*(send_requests(host, port, [bid_request(device)]) for device in devices))
+        openings = await send_requests(host, port, [open_request(device, proof)
+                                                    for device, (proof,) in zip(devices, proofs)])
+        return devices, [proof for proof, in proofs], openings
+
+    gateway, (devices, proofs, openings) = asyncio.run(with_gateway(chain, scenario, batch_size=4, max_pending=2,
+                                                                    batch_timeout=0.1))
+    assert [proof['status'] for proof in proofs] == ['accepted'] * len(devices)
+    assert [opening['status'] for opening in openings] == ['opened'] * len(devices)
+    assert gateway.submitted == len(devices) and max(chain.submissions) <= 4
+    for device, proof in zip(devices, proofs):
+        leaf = bid_leaf(device.address, *device.sealed, device.packed_ring, device.bidder_type)
+        root = bytes.fromhex(proof['root'])
+        assert merkle_verify(leaf, proof['position'], chain.roots[0][root],
+                             [bytes.fromhex(sibling) for sibling in proof['proof']], root)
+
+    result = open_and_clear(0, chain.aggregators[0].bids(), chain.roots[0], auctioneer=auctioneer,
+                            registry=chain.registry)
+    assert result['invalid'] == [] and result['invalid_batched'] == []
+    assert sorted(result['bidders']) == sorted(device.address for device in devices)
+
+
+@pytest.mark.parametrize('batch_size, sizes', [(None, [1, 3, 5]), (4, [1, 3, 4, 1])])
+def test_batch_size_is_not_set_by_the_first_submission(batch_size, sizes):
+    aggregator = Aggregator(batch_size)
+    sealed = []
+    for count, start in [(1, 0), (3, 1), (5, 4)]:
+        for index in range(start, start + count):
+            aggregator.collect(f'device-{index}', b'c', b'c', b'sig', b'ring', 1)
+
+        sealed.extend(size for _, _, size in aggregator.seal())
+
+    assert sealed == sizes
+
+
+def test_malformed_and_duplicate_bids_are_rejected(auctioneer, chain):
+    async def scenario(host, port):
+        devices = await seal_bids(host, port, auctioneer, chain)
+        truncated = dict(bid_request(devices[0]), sig=bid_request(devices[0])['sig'][:-2])
+        return await send_requests(host, port, [truncated, bid_request(devices[0]), bid_request(devices[0]),
+                                                {'type': 'bid', 'auction_id': 0}, {'type': 'unknown', 'auction_id': 0}])
+
+    gateway, responses = asyncio.run(with_gateway(chain, scenario, batch_timeout=0.01))
+    assert [response['status'] for response in responses] == ['rejected', 'accepted', 'rejected', 'rejected',
+                                                              'rejected']
+    assert responses[2]['reason'] == 'duplicate identifier device-0'
+    assert gateway.rejected == 4 and gateway.submitted == 1
+
+
+def test_openings_are_checked_against_the_commitments(auctioneer, chain):
+    async def scenario(host, port):
+        devices = await seal_bids(host, port, auctioneer, chain)
+        (proof,) = await send_requests(host, port, [bid_request(devices[0])])
+        return await send_requests(host, port, [
+            open_request(devices[0], proof, tau_1=devices[1].tau_1),  # Valid format, wrong bid.
+            open_request(devices[0], proof),
+            open_request(devices[0], proof),  # Cannot be overwritten.
+            open_request(devices[0], proof, auction_id=7),  # Auction without batched bids.
+            dict(open_request(devices[0], proof), position=5)
+        ])
+
+    _, responses = asyncio.run(with_gateway(chain, scenario, batch_timeout=0.01))
+    assert [response['status'] for response in responses] == ['rejected', 'opened', 'rejected', 'rejected',
+                                                              'rejected']
+    assert responses[0]['reason'] == 'opening does not match the commitments of the bid'
+    assert responses[2]['reason'] == 'bid is already opened'
+    assert responses[3]['reason'] == responses[4]['reason'] == 'unknown bid'
@@ -0,0 +1,60 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import numpy as np
+import pytest
+
+from src.allocation import allocate
+from src.order_book import OrderBook
+from src.scenarios import ScenarioEngine
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_book_matches_in_memory_clearing(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 60))
+    price, quantity, bidder_type = rng.integers(0, 10, n), rng.integers(0, 40, n), rng.integers(0, 2, n)
+    status = rng.random(n) > 0.2
+    chunk_size = int(rng.integers(1, 20))
+    book = OrderBook(tmp_path / 'auction.book', capacity=int(rng.integers(1, 8)))
+    for i in range(n):
+        book.append(f'0x{i:040x}', int(quantity[i]), int(price[i]), int(bidder_type[i]), bool(status[i]))
+
+    clearing_quantity, clearing_price, clearing_type = book.clear(chunk_size)
+    expected = ScenarioEngine(price[status], quantity[status], bidder_type[status]).run()
+    assert (clearing_quantity, clearing_price, clearing_type) == \
+        (expected['quantity'][0], expected['price'][0], expected['type'][0])
+
+    book.allocate(clearing_quantity, chunk_size)
+    fills = [fill for _, chunk in book.allocation(chunk_size) for fill in chunk]
+    assert fills == allocate(price[status], quantity[status], bidder_type[status], clearing_quantity).tolist()
+
+    book.flush()
+    assert len(OrderBook(tmp_path / 'auction.book', mode='r')) == n
+
+
+def test_missing_directory_is_created(tmp_path):
+    book = OrderBook(tmp_path / 'books' / 'interval_0' / 'auction.book')
+    book.append('0x' + '0' * 40, 1, 1, 0)
+    assert len(book) == 1
+
+
+def test_long_identifiers(tmp_path):
+    identifier = 'bidder-' + 'x' * 60
+    book = OrderBook(tmp_path / 'wide.book', capacity=1, address_size=len(identifier))
+    book.append(identifier, 1, 2, 1)
+    book.append('0x1', 3, 4, 0)  # Grows the book.
+    assert [address for chunk, _ in book.allocation() for address in chunk] == [identifier, '0x1']
+
+    with pytest.raises(ValueError):
+        OrderBook(tmp_path / 'narrow.book').append(identifier, 1, 2, 1)
+
+
+def test_out_of_range_values(tmp_path):
+    book = OrderBook(tmp_path / 'auction.book')
+    with pytest.raises(ValueError):
+        book.append('0x1', 2 ** 70, 1, 1)
+
+    assert len(book) == 0
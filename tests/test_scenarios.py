@@ -0,0 +1,97 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# ----------------------------------------------------- IMPORTS ----------------------------------------------------- #
+
+import contextlib
+import io
+import numpy as np
+import pytest
+
+from src.auctioneer import Auctioneer
+from src.order_book import OrderBook
+from src.scenarios import ScenarioEngine, clear_levels
+
+
+def uniform_price(price, quantity, bidder_type):
+    """
+    :return: Clearing quantity, price and type of a book, as computed by Auctioneer.get_uniform_price.
+    """
+    auctioneer = Auctioneer('0x0', generate_new_keys=False)
+    auctioneer.bidders = {index: {'quantity': q, 'bid_value': p, 'bidder_type': t, 'status': True}
+                          for index, (p, q, t) in enumerate(zip(price, quantity, bidder_type))}
+    with contextlib.redirect_stdout(io.StringIO()):
+        auctioneer.get_uniform_price()
+
+    return auctioneer.clearingQuantity, auctioneer.clearingPrice, auctioneer.clearingType
+
+
+def random_book(rng, n):
+    """
+    :return: A book of n bids which crosses, get_uniform_price being undefined otherwise.
+    """
+    price = rng.integers(0, 20, n)
+    quantity = rng.integers(1, 50, n)
+    bidder_type = rng.integers(0, 2, n)
+    price[:2], bidder_type[:2] = (19, 0), (1, 0)
+    return price, quantity, bidder_type
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_single_scenario_matches_uniform_price(seed):
+    rng = np.random.default_rng(seed)
+    price, quantity, bidder_type = random_book(rng, int(rng.integers(2, 30)))
+    result = ScenarioEngine(price, quantity, bidder_type).run()
+    expected = uniform_price(price.tolist(), quantity.tolist(), bidder_type.tolist())
+    assert (result['quantity'][0], result['price'][0], result['type'][0]) == expected
+
+
+@pytest.mark.parametrize('seed', range(100))
+def test_zero_quantities_do_not_change_the_clearing(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    price, quantity, bidder_type = random_book(rng, int(rng.integers(2, 30)))
+    quantity[2:] *= rng.random(len(quantity) - 2) > 0.3
+    opened = quantity > 0  # Bids of quantity 0 are rejected at opening.
+    expected = uniform_price(price[opened].tolist(), quantity[opened].tolist(), bidder_type[opened].tolist())
+
+    levels, index = np.unique(price, return_inverse=True)
+    demand = np.bincount(index, quantity * (bidder_type != 0), len(levels))
+    supply = np.bincount(index, quantity * (bidder_type == 0), len(levels))
+    clearing = clear_levels(levels, demand[None, :], supply[None, :])
+    assert (clearing['quantity'][0], clearing['price'][0], clearing['type'][0]) == expected
+
+    book = OrderBook(tmp_path / 'auction.book')
+    for i in range(len(price)):
+        book.append(f'0x{i:040x}', int(quantity[i]), int(price[i]), int(bidder_type[i]))
+
+    assert book.clear() == expected
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_capped_scenarios_match_uniform_price(seed):
+    rng = np.random.default_rng(seed)
+    n, scenarios = 30, 50
+    price, quantity, bidder_type = random_book(rng, n)
+    scale = rng.integers(1, 4, (scenarios, n))
+    active = rng.random((scenarios, n)) > 0.2
+    active[:, :2] = True
+    cap = np.where(rng.random(scenarios) > 0.3, rng.integers(1, 25, scenarios), np.inf)
+    result = ScenarioEngine(price, quantity, bidder_type).run(scale, active, cap)
+    for s in range(scenarios):
+        capped_price = np.where(bidder_type != 0, np.minimum(price, cap[s]), price)
+        keep = active[s] & ~((bidder_type == 0) & (price > cap[s]))
+        books = [capped_price[keep].tolist(), (quantity * scale[s])[keep].tolist(), bidder_type[keep].tolist()]
+        expected = uniform_price(*books)
+        assert (result['quantity'][s], result['price'][s], result['type'][s]) == expected, s
+
+
+def test_parallel_run_matches_serial_run():
+    rng = np.random.default_rng(0)
+    price, quantity, bidder_type = random_book(rng, 40)
+    engine = ScenarioEngine(price, quantity, bidder_type)
+    scale = rng.uniform(0.5, 1.5, (300, 40))
+    cap = rng.integers(5, 20, 300).astype(float)
+    serial = engine.run(scale, price_cap=cap)
+    parallel = engine.run(scale, price_cap=cap, processes=2, chunk_size=100)
+    assert all(np.array_equal(serial[key], parallel[key]) for key in serial)
+